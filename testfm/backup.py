@@ -18,6 +18,7 @@ Options:
     -h, --help                    print help
 """
 from testfm.base import Base
+from testfm.log import logger
 
 
 class Backup(Base):
@@ -60,3 +61,157 @@ class Backup(Base):
 
         result = cls._construct_command(options)
         return result
+
+
+# directories foreman-maintain puts into each part of a backup
+BACKUP_SOURCES = {
+    "config": [
+        "/etc/foreman",
+        "/etc/foreman-installer",
+        "/etc/foreman-proxy",
+        "/etc/katello",
+        "/etc/pki/katello",
+        "/etc/pulp",
+        "/etc/puppetlabs",
+        "/etc/candlepin",
+        "/root/ssl-build",
+        "/var/www/html/pub",
+    ],
+    "mongo": ["/var/lib/mongodb", "/var/opt/rh/rh-mongodb34/lib/mongodb"],
+    "pgsql": ["/var/lib/pgsql/data", "/var/opt/rh/rh-postgresql12/lib/pgsql/data"],
+    "pulp": ["/var/lib/pulp"],
+}
+
+# how each part ends up in the backup per mode: gzip compressed or stored as is
+BACKUP_PLANS = {
+    "online": {"config": "gzip", "mongo": "raw", "pgsql": "gzip", "pulp": "raw"},
+    "offline": {"config": "gzip", "mongo": "gzip", "pgsql": "gzip", "pulp": "raw"},
+    "snapshot": {"config": "gzip", "mongo": "gzip", "pgsql": "gzip", "pulp": "raw"},
+}
+
+SIZE_SCRIPT = (
+    "for d in {dirs}; do [ -d $d ] && "
+    "du -sb --apparent-size $d 2>/dev/null | awk '{{print \"size {group}\", $1}}' & done"
+)
+
+SAMPLE_SCRIPT = (
+    "find {dirs} -type f -size +1k -print0 2>/dev/null | shuf -z -n {files} | "
+    "xargs -0 -r head -q -c {chunk} > $sample 2>/dev/null; start=$(date +%s.%N); "
+    "packed=$(gzip -c $sample | wc -c); "
+    'echo "sample {group} $(stat -c %s $sample) $packed $start $(date +%s.%N)"'
+)
+
+FREE_SCRIPT = (
+    "d={destination}; while [ ! -d $d ]; do d=$(dirname $d); done; "
+    "df -P -B1 $d | awk 'NR==2 {{print \"free\", $4}}'"
+)
+
+
+class BackupEstimator(object):
+    """Predicts size and duration of a backup and compares them with free space
+
+    The source directories are sized in parallel on the server and a random
+    sample of their files is gzipped to measure compressibility and
+    compression speed, which is what ``tar --gzip`` spends most of its time on.
+    """
+
+    sample_files = 32
+    sample_chunk = 256 * 1024
+    throughput = 100 * 1024 ** 2  # bytes/s for parts stored without compression
+    margin = 1.1
+
+    def __init__(self, ansible_module):
+        self.ansible_module = ansible_module
+
+    def _script(self, plan, destination):
+        """Build the shell script collecting sizes, samples and free space"""
+        sizes = [
+            SIZE_SCRIPT.format(dirs=" ".join(BACKUP_SOURCES[group]), group=group)
+            for group in plan
+        ]
+        samples = [
+            SAMPLE_SCRIPT.format(
+                dirs=" ".join(BACKUP_SOURCES[group]),
+                group=group,
+                files=self.sample_files,
+                chunk=self.sample_chunk,
+            )
+            for group, packing in plan.items()
+            if packing == "gzip"
+        ]
+        return "; ".join(
+            ["sample=$(mktemp)"]
+            + sizes
+            + ["wait"]
+            + samples
+            + ["rm -f $sample", FREE_SCRIPT.format(destination=destination)]
+        )
+
+    def _predict(self, plan, lines):
+        """Turn the output of the estimate script into a prediction"""
+        sizes = dict.fromkeys(plan, 0)
+        ratios = {}
+        speeds = {}
+        free = 0
+        for line in lines:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == "size":
+                sizes[fields[1]] += int(fields[2])
+            elif fields[0] == "sample":
+                raw, packed = int(fields[2]), int(fields[3])
+                elapsed = float(fields[5]) - float(fields[4])
+                if raw:
+                    ratios[fields[1]] = float(packed) / raw
+                    speeds[fields[1]] = raw / max(elapsed, 1e-6)
+            elif fields[0] == "free":
+                free = int(fields[1])
+        groups = {}
+        for group, packing in plan.items():
+            raw = sizes[group]
+            if packing == "gzip":
+                size = raw * ratios.get(group, 1.0)
+                duration = raw / speeds.get(group, self.throughput)
+            else:
+                size = raw
+                duration = float(raw) / self.throughput
+            groups[group] = {"source": raw, "size": int(size), "duration": duration}
+        size = sum(part["size"] for part in groups.values())
+        return {
+            "size": size,
+            "duration": sum(part["duration"] for part in groups.values()),
+            "free": free,
+            "fits": size * self.margin <= free,
+            "groups": groups,
+        }
+
+    def estimate(self, mode, destination, skip_pulp_content=False):
+        """Predict the backup of mode into destination for every contacted host
+
+        :param str mode: 'online', 'offline' or 'snapshot'
+        :param str destination: backup directory, it does not need to exist yet
+        :param bool skip_pulp_content: leave pulp content out as --skip-pulp-content does
+        :return: dict of host to prediction with 'size', 'duration', 'free'
+            and 'fits' keys plus a per part breakdown under 'groups'
+        """
+        plan = dict(BACKUP_PLANS[mode])
+        if skip_pulp_content:
+            del plan["pulp"]
+        contacted = self.ansible_module.shell(self._script(plan, destination))
+        return {
+            host: self._predict(plan, result["stdout_lines"]) for host, result in contacted.items()
+        }
+
+    def check(self, mode, destination, skip_pulp_content=False):
+        """Assert that the backup of mode fits into destination on every host"""
+        estimates = self.estimate(mode, destination, skip_pulp_content)
+        for host, estimate in estimates.items():
+            logger.info(
+                "{}: {} backup into {} needs ~{size} bytes and ~{duration:.0f}s, "
+                "{free} bytes free".format(host, mode, destination, **estimate)
+            )
+            assert estimate["fits"], "{}: not enough space in {} for {} backup".format(
+                host, destination, mode
+            )
+        return estimates
@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+"""Local index of the backups found on the server.
+
+A single remote ``find`` lists every file below the scanned directories and
+prints the ``metadata.yml`` of every backup, so looking up a backup or
+comparing two of them needs no further remote calls.
+"""
+from collections import namedtuple
+
+import yaml
+
+LISTING_SCRIPT = (
+    "find {roots} -mindepth 1 -maxdepth {depth} -printf 'F\\t%h\\t%f\\t%s\\t%T@\\n'; "
+    "find {roots} -maxdepth {depth} -name metadata.yml -printf 'M\\t%h\\n' "
+    "-exec cat {{}} \\; -printf '\\n{end}\\n'"
+)
+METADATA_END = "#testfm-metadata-end"
+
+
+class BackupEntry(namedtuple("BackupEntry", "host path files metadata mtime")):
+    """A backup directory: its host, path, files mapped to sizes, parsed
+    metadata.yml and the time the metadata was written
+    """
+
+    @property
+    def size(self):
+        """Total size of the files in the backup"""
+        return sum(self.files.values())
+
+    @property
+    def incremental(self):
+        """Whether the backup was taken with --incremental"""
+        return bool(self.metadata.get("incremental"))
+
+    @property
+    def hostname(self):
+        """Hostname of the backed up server"""
+        return self.metadata.get("hostname")
+
+
+def _normalize(metadata):
+    """foreman-maintain writes symbol keys in some versions, ':incremental' -> 'incremental'"""
+    if not isinstance(metadata, dict):
+        return {}
+    return {str(key).lstrip(":"): value for key, value in metadata.items()}
+
+
+def parse_listing(host, lines):
+    """Build backup entries of host out of the output of LISTING_SCRIPT"""
+    files = {}
+    mtimes = {}
+    metadata = {}
+    current = None
+    for line in lines:
+        if current is not None:
+            if line == METADATA_END:
+                metadata[current[0]] = _normalize(yaml.safe_load("\n".join(current[1])))
+                current = None
+            else:
+                current[1].append(line)
+        elif line.startswith("F\t"):
+            _, directory, name, size, mtime = line.split("\t")
+            files.setdefault(directory, {})[name] = int(size)
+            mtimes[(directory, name)] = float(mtime)
+        elif line.startswith("M\t"):
+            current = (line[2:], [])
+    return [
+        BackupEntry(
+            host, path, files.get(path, {}), data, mtimes.get((path, "metadata.yml"), 0.0)
+        )
+        for path, data in metadata.items()
+    ]
+
+
+class BackupCatalog(object):
+    """Index of the backups below one or more directories on every contacted host
+
+    Usage::
+
+        catalog = BackupCatalog(ansible_module, "/tmp/backup-dir")
+        files_list = catalog.latest().files
+    """
+
+    def __init__(self, ansible_module, roots, depth=3):
+        if isinstance(roots, str):
+            roots = [roots]
+        self.ansible_module = ansible_module
+        self.roots = roots
+        self.depth = depth
+        self.entries = []
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the listing and metadata from the server"""
+        contacted = self.ansible_module.shell(
+            LISTING_SCRIPT.format(roots=" ".join(self.roots), depth=self.depth, end=METADATA_END)
+        )
+        self.entries = []
+        for host, result in contacted.items():
+            self.entries.extend(parse_listing(host, result["stdout"].splitlines()))
+        self.entries.sort(key=lambda entry: entry.mtime)
+        return self
+
+    def find(self, host=None, hostname=None, incremental=None):
+        """Return the backups matching the criteria, oldest first
+
+        :param str host: ansible host the backup was found on
+        :param str hostname: hostname of the backed up server from metadata.yml
+        :param bool incremental: True for incremental backups only, False for full ones
+        """
+        return [
+            entry
+            for entry in self.entries
+            if (host is None or entry.host == host)
+            and (hostname is None or entry.hostname == hostname)
+            and (incremental is None or entry.incremental == incremental)
+        ]
+
+    def latest(self, **criteria):
+        """Return the most recent backup matching the criteria of :meth:`find`"""
+        found = self.find(**criteria)
+        assert found, "No backup matching {} found in {}".format(criteria, self.roots)
+        return found[-1]
+
+    def get(self, path, host=None):
+        """Return the backup in path"""
+        for entry in self.find(host=host):
+            if entry.path == path.rstrip("/"):
+                return entry
+        raise KeyError(path)
+
+    @staticmethod
+    def diff(first, second):
+        """Compare the files of two backups
+
+        :return: dict with 'added' and 'removed' file names and 'changed'
+            mapping names present in both to their (first, second) sizes
+        """
+        return {
+            "added": sorted(set(second.files) - set(first.files)),
+            "removed": sorted(set(first.files) - set(second.files)),
+            "changed": {
+                name: (size, second.files[name])
+                for name, size in first.files.items()
+                if name in second.files and second.files[name] != size
+            },
+        }
@@ -0,0 +1,98 @@
+# -*- encoding: utf-8 -*-
+"""Session-wide pool of golden backups used by the restore tests.
+
+Taking a backup is the most expensive step of the restore tests, so the pool
+takes one online and one offline backup per session and hands every test a
+copy-on-write clone of it. Clones are made with ``cp --reflink=always`` where
+the filesystem supports it, otherwise they are hardlinked and the shared
+archives are marked immutable for the lifetime of the clone, so a restore can
+never alter the golden copy. The immutable flag belongs to the inode the golden
+copy shares with every hardlinked clone, so files are un-protected one at a
+time, only while their link is made or removed.
+"""
+from fauxfactory import gen_string
+
+from testfm.backup import Backup
+from testfm.backup import BackupEstimator
+from testfm.log import logger
+
+POOL_DIR = "/var/tmp/testfm-backup-pool"
+
+# an immutable file cannot be linked, each one is un-protected just to link it
+LINK_SCRIPT = """rm -rf {clone}
+cp -a --attributes-only {golden} {clone} || exit 1
+cd {golden} && find . -type f | while read -r file; do
+    chattr -i "$file" && ln -f "$file" "{clone}/$file"; rc=$?
+    chattr +i "$file"; [ $rc -eq 0 ] || exit 1
+done && echo hardlink"""
+
+CLONE_SCRIPT = """cp -a --reflink=always {golden} {clone} 2>/dev/null && echo reflink && exit 0
+""" + LINK_SCRIPT
+
+# links shared with the golden copy are removed one at a time, the golden copy keeps them
+RELEASE_SCRIPT = """cd {clone} && find . -type f | while read -r file; do
+    if [ "$file" -ef "{golden}/$file" ]; then
+        chattr -i "$file"; rm -f "$file"; chattr +i "{golden}/$file"
+    fi
+done
+cd / && chattr -R -f -i {clone}; rm -rf {clone}"""
+
+REMOVE_SCRIPT = "chattr -R -f -i {0}; rm -rf {0}"
+
+
+class BackupPool(object):
+    """Takes golden backups lazily and hands out disposable clones of them"""
+
+    backup_commands = {
+        "online": Backup.run_online_backup,
+        "offline": Backup.run_offline_backup,
+    }
+
+    def __init__(self, pool_dir=POOL_DIR):
+        self.pool_dir = pool_dir
+        self.golden = {}
+        self.clones = {}
+        self._ansible_module = None
+
+    def golden_dir(self, ansible_module, mode):
+        """Return the golden backup directory of mode, taking the backup on first use"""
+        self._ansible_module = ansible_module
+        if mode in self.golden:
+            return self.golden[mode]
+        if not self.golden:
+            # leftovers of an aborted session would break the hardlink fallback
+            ansible_module.shell(REMOVE_SCRIPT.format(self.pool_dir))
+        path = "{}/golden-{}".format(self.pool_dir, mode)
+        BackupEstimator(ansible_module).check(mode, path)
+        ansible_module.file(path=path, state="directory", owner="postgres")
+        contacted = ansible_module.command(
+            self.backup_commands[mode](["-y", "--preserve-directory", path])
+        )
+        for result in contacted.values():
+            logger.info(result["stdout"])
+            assert "FAIL" not in result["stdout"]
+            assert result["rc"] == 0
+        self.golden[mode] = path
+        return path
+
+    def clone(self, ansible_module, mode):
+        """Return the path of a fresh clone of the golden backup of mode"""
+        golden = self.golden_dir(ansible_module, mode)
+        clone = "{}/clone-{}-{}".format(self.pool_dir, mode, gen_string("alpha"))
+        contacted = ansible_module.shell(CLONE_SCRIPT.format(golden=golden, clone=clone))
+        for result in contacted.values():
+            logger.info("{} cloned to {} ({})".format(golden, clone, result["stdout"]))
+            assert result["rc"] == 0
+        self.clones[clone] = golden
+        return clone
+
+    def release(self, ansible_module, clone):
+        """Remove a clone handed out by :meth:`clone`"""
+        ansible_module.shell(RELEASE_SCRIPT.format(clone=clone, golden=self.clones.pop(clone)))
+
+    def destroy(self):
+        """Remove the golden backups and all clones still around"""
+        if self._ansible_module is not None:
+            self._ansible_module.shell(REMOVE_SCRIPT.format(self.pool_dir))
+        self.golden.clear()
+        self.clones.clear()
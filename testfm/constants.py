@@ -1,4 +1,5 @@
 import configparser
+import os
 
 config = configparser.ConfigParser()
 config.read("testfm.properties")
@@ -10,7 +11,11 @@ DOGFOOD_ORG = config["subscription"]["DOGFOOD_ORG"]
 DOGFOOD_ACTIVATIONKEY = config["subscription"]["DOGFOOD_ACTIVATIONKEY"]
 DOGFOOD_URL = config["subscription"]["DOGFOOD_URL"]
 HOTFIX_URL = config["URLS"]["HOTFIX_URL"]
-SERVER_HOSTNAME = config["SERVER"]["SERVER_HOSTNAME"]
+# set by testfm.scheduler for the pytest worker of each host of a host pool
+SERVER_HOSTNAME = os.environ.get("TESTFM_SERVER_HOSTNAME") or config["SERVER"]["SERVER_HOSTNAME"]
+FOREMAN_URL = config.get("SERVER", "FOREMAN_URL", fallback="https://{}".format(SERVER_HOSTNAME))
+FOREMAN_USERNAME = config.get("SERVER", "FOREMAN_USERNAME", fallback="admin")
+FOREMAN_PASSWORD = config.get("SERVER", "FOREMAN_PASSWORD", fallback="changeme")
 katello_ca_consumer = DOGFOOD_URL + "/pub/katello-ca-consumer-latest.noarch.rpm"
 upstream_url = {
     "candlepin_repo": (
@@ -76,6 +81,7 @@ sat_repos = {
     "6.8": sat_68_repos,
 }
 foreman_maintain_yml = "/etc/foreman-maintain/foreman_maintain.yml"
+foreman_maintain_data_yml = "/var/lib/foreman-maintain/data.yml"
 epel_repo = "https://dl.fedoraproject.org/pub/epel/epel-release-latest-7.noarch.rpm"
 satellite_answer_file = "/etc/foreman-installer/scenarios.d/satellite-answers.yaml"
 fm_hammer_yml = "/etc/foreman-maintain/foreman-maintain-hammer.yml"
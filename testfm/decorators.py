@@ -3,10 +3,14 @@ import unittest2
 
 from testfm.helpers import product
 from testfm.helpers import server
+from testfm.state import validate
 
 # Run for capsule
 capsule = pytest.mark.capsule
 
+# Scale tests, take hours on the largest sizes, skipped unless run with --run-scale
+scale = pytest.mark.scale
+
 
 def stubbed(reason=None):
     """Skips test due to non-implentation or some other reason."""
@@ -81,3 +85,33 @@ def ends_in(version):
         reason="Server version is '{}' and this test will run only "
         "on {} <= '{}'".format(product(), server(), version),
     )
+
+
+def requires_state(**state):
+    """Decorator declaring the host state a test needs, see :mod:`testfm.state`.
+
+    Usage::
+
+        @requires_state(services="stopped")
+        def test_service_status_stopped():
+            # test code continues here
+
+    :param str state: value of each part of the host state, 'services',
+        'maintenance_mode' or 'packages'
+    """
+    return pytest.mark.requires_state(**validate(state))
+
+
+def leaves_state(**state):
+    """Decorator declaring the host state a passed test leaves behind, see :mod:`testfm.state`.
+
+    Usage::
+
+        @leaves_state(packages="unlocked")
+        def test_packages_unlock():
+            # test code continues here, without locking the packages again
+
+    :param str state: value of each part of the host state, 'services',
+        'maintenance_mode' or 'packages'
+    """
+    return pytest.mark.leaves_state(**validate(state))
@@ -0,0 +1,79 @@
+# -*- encoding: utf-8 -*-
+"""Structured snapshot of the firewall rules of the server.
+
+``iptables -L`` resolves the address of every rule and can stall for seconds
+on hosts without DNS. ``iptables-save`` and ``nft -j list ruleset`` never do
+lookups and are parsed here into tables, chains and rules, so tests check for
+a chain with a set lookup instead of scanning text.
+"""
+import json
+from collections import namedtuple
+
+NFT_MARKER = "#testfm-nft"
+
+SNAPSHOT_SCRIPT = "iptables-save 2>/dev/null; echo '{}'; nft -j list ruleset 2>/dev/null".format(
+    NFT_MARKER
+)
+
+FirewallSnapshot = namedtuple("FirewallSnapshot", "tables chains rules")
+FirewallSnapshot.__doc__ = """Firewall rules of a host: sets of table and chain names and a list
+of (table, chain, rule) tuples, rule being the iptables-save arguments or nft JSON"""
+
+
+def parse_iptables_save(output, snapshot):
+    """Add the tables, chains and rules of iptables-save output to snapshot"""
+    table = None
+    for line in output.splitlines():
+        if line.startswith("*"):
+            table = line[1:].strip()
+            snapshot.tables.add(table)
+        elif line.startswith(":"):
+            snapshot.chains.add(line[1:].split()[0])
+        elif line.startswith("-A "):
+            fields = line.split(None, 2)
+            snapshot.rules.append((table, fields[1], fields[2] if len(fields) > 2 else ""))
+
+
+def parse_nft_json(output, snapshot):
+    """Add the tables, chains and rules of nft -j list ruleset output to snapshot"""
+    try:
+        ruleset = json.loads(output)["nftables"]
+    except (ValueError, KeyError):
+        return
+    for item in ruleset:
+        if "table" in item:
+            snapshot.tables.add(item["table"]["name"])
+        elif "chain" in item:
+            snapshot.chains.add(item["chain"]["name"])
+        elif "rule" in item:
+            rule = item["rule"]
+            snapshot.rules.append((rule["table"], rule["chain"], json.dumps(rule["expr"])))
+
+
+def parse_snapshot(output):
+    """Parse the output of SNAPSHOT_SCRIPT into a :data:`FirewallSnapshot`"""
+    iptables, _, nft = output.partition(NFT_MARKER)
+    snapshot = FirewallSnapshot(set(), set(), [])
+    parse_iptables_save(iptables, snapshot)
+    parse_nft_json(nft, snapshot)
+    return snapshot
+
+
+def firewall_snapshot(ansible_module):
+    """Take a firewall snapshot of every contacted host
+
+    Usage::
+
+        for snapshot in firewall_snapshot(ansible_module).values():
+            assert "FOREMAN_MAINTAIN" in snapshot.chains
+
+    :return: dict of host to :data:`FirewallSnapshot`
+    """
+    snapshots = {}
+    for host, result in ansible_module.shell(SNAPSHOT_SCRIPT).items():
+        snapshots[host] = parse_snapshot(result["stdout"])
+        # without a table neither tool answered, a missing chain would prove nothing
+        assert snapshots[host].tables, "No firewall table on {}: {}".format(
+            host, result["stdout"]
+        )
+    return snapshots
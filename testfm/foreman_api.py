@@ -0,0 +1,137 @@
+# -*- encoding: utf-8 -*-
+"""Bulk creation and lookup of organizations and sync plans through the Foreman API.
+
+One pooled HTTP session is shared by every request and bulk creations are
+sent concurrently over it, so fixtures needing hundreds of organizations or
+thousands of sync plans do not pay a hammer start per object. Lists are read
+page by page. :mod:`testfm.foreman_api_stub` serves the same endpoints from
+memory for running without a Satellite.
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from testfm.constants import FOREMAN_PASSWORD
+from testfm.constants import FOREMAN_URL
+from testfm.constants import FOREMAN_USERNAME
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class ForemanAPI(object):
+    """Pooled session to the Foreman API
+
+    Usage::
+
+        api = ForemanAPI()
+        org_ids = api.create_organizations(["org1", "org2"])
+        plan_ids = api.create_sync_plans(org_ids[0], ["plan1", "plan2"])
+    """
+
+    def __init__(
+        self,
+        url=FOREMAN_URL,
+        username=FOREMAN_USERNAME,
+        password=FOREMAN_PASSWORD,
+        workers=10,
+        per_page=1000,
+    ):
+        self.url = url.rstrip("/")
+        self.workers = workers
+        self.per_page = per_page
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        self.session.verify = False
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, **kwargs):
+        """Send a request, fail on an error status and return the decoded JSON body"""
+        response = self.session.request(method, "{}{}".format(self.url, path), **kwargs)
+        assert response.ok, "{} {}: {} {}".format(
+            method, path, response.status_code, response.text
+        )
+        return response.json() if response.content else None
+
+    def paginate(self, path, **params):
+        """Yield every result of a list endpoint, one page at a time"""
+        page = 1
+        while True:
+            params.update({"page": page, "per_page": self.per_page})
+            body = self.request("GET", path, params=params)
+            for result in body["results"]:
+                yield result
+            if page * self.per_page >= int(body["subtotal"]):
+                return
+            page += 1
+
+    def bulk(self, function, items):
+        """Call function for every item concurrently, return the results in order"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(function, items))
+
+    def organizations(self):
+        """Return every organization"""
+        return list(self.paginate("/katello/api/organizations"))
+
+    def create_organizations(self, names):
+        """Create an organization per name, return their ids"""
+        return self.bulk(
+            lambda name: self.request(
+                "POST", "/katello/api/organizations", json={"organization": {"name": name}}
+            )["id"],
+            names,
+        )
+
+    def delete_organizations(self, ids):
+        """Delete organizations by id"""
+        path = "/katello/api/organizations/{}"
+        self.bulk(lambda id: self.request("DELETE", path.format(id)), ids)
+
+    def sync_plans(self, organization_id):
+        """Return every sync plan of an organization"""
+        return list(
+            self.paginate("/katello/api/organizations/{}/sync_plans".format(organization_id))
+        )
+
+    def create_sync_plans(self, organization_id, names, interval="weekly", enabled=True):
+        """Create a sync plan per name in an organization, return their ids"""
+        path = "/katello/api/organizations/{}/sync_plans".format(organization_id)
+        sync_date = datetime.datetime.today().strftime("%Y-%m-%d %H:%M:%S")
+        return self.bulk(
+            lambda name: self.request(
+                "POST",
+                path,
+                json={
+                    "name": name,
+                    "interval": interval,
+                    "sync_date": sync_date,
+                    "enabled": enabled,
+                },
+            )["id"],
+            names,
+        )
+
+    def delete_sync_plans(self, organization_id, ids):
+        """Delete sync plans of an organization by id"""
+        path = "/katello/api/organizations/{}/sync_plans/{{}}".format(organization_id)
+        self.bulk(lambda id: self.request("DELETE", path.format(id)), ids)
+
+    def enabled_sync_plan_ids(self):
+        """Return the ids of the enabled sync plans of every organization"""
+        organization_ids = [organization["id"] for organization in self.organizations()]
+        return sorted(
+            plan["id"]
+            for plans in self.bulk(self.sync_plans, organization_ids)
+            for plan in plans
+            if plan["enabled"]
+        )
+
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
@@ -0,0 +1,151 @@
+# -*- encoding: utf-8 -*-
+"""In-memory stand-in of the organization and sync plan endpoints of the Foreman API.
+
+It serves what :class:`testfm.foreman_api.ForemanAPI` uses, with the same
+pagination, so fixture builders can be exercised without a Satellite.
+
+Usage::
+
+    with StubForemanAPI() as url:
+        api = ForemanAPI(url)
+        api.create_organizations(["org1"])
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+ORGANIZATIONS_RE = re.compile(r"^/katello/api/organizations(?:/(?P<id>\d+))?$")
+SYNC_PLANS_RE = re.compile(
+    r"^/katello/api/organizations/(?P<organization>\d+)/sync_plans(?:/(?P<id>\d+))?$"
+)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes requests to the :class:`StubForemanAPI` of the server"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode()) if length else {}
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, body = self.server.stub.handle(method, url.path, params, self._body())
+        self._reply(status, body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class StubForemanAPI(object):
+    """Serves organizations and sync plans from memory on a local port"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.organizations = {}
+        self.sync_plans = {}
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.server = _ThreadingHTTPServer((host, port), _Handler)
+        self.server.stub = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        """Base URL to pass to :class:`testfm.foreman_api.ForemanAPI`"""
+        return "http://{}:{}".format(*self.server.server_address)
+
+    def __enter__(self):
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def _page(records, params):
+        """Return a Foreman list response of the page of records params ask for"""
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 20))
+        results = sorted(records, key=lambda record: record["id"])
+        first, last = (page - 1) * per_page, page * per_page
+        return {
+            "total": len(results),
+            "subtotal": len(results),
+            "page": page,
+            "per_page": per_page,
+            "results": results[first:last],
+        }
+
+    def _create(self, table, record):
+        with self.lock:
+            self.last_id += 1
+            record["id"] = self.last_id
+            table[record["id"]] = record
+        return 201, record
+
+    def _delete_organization(self, organization_id):
+        """Delete an organization with its sync plans, as Katello does"""
+        with self.lock:
+            if self.organizations.pop(organization_id, None) is None:
+                return 404, {"error": "not found"}
+            for plan_id, plan in list(self.sync_plans.items()):
+                if plan["organization_id"] == organization_id:
+                    del self.sync_plans[plan_id]
+        return 200, {}
+
+    def handle(self, method, path, params, body):
+        """Return the status and body answering a request"""
+        match = ORGANIZATIONS_RE.match(path)
+        if match:
+            if match.group("id"):
+                if method == "DELETE":
+                    return self._delete_organization(int(match.group("id")))
+                return 404, {"error": "not found"}
+            if method == "POST":
+                return self._create(self.organizations, {"name": body["organization"]["name"]})
+            return 200, self._page(self.organizations.values(), params)
+        match = SYNC_PLANS_RE.match(path)
+        if match and int(match.group("organization")) in self.organizations:
+            organization_id = int(match.group("organization"))
+            if match.group("id"):
+                if method == "DELETE" and self.sync_plans.pop(int(match.group("id")), None):
+                    return 200, {}
+                return 404, {"error": "not found"}
+            if method == "POST":
+                body["organization_id"] = organization_id
+                return self._create(self.sync_plans, body)
+            plans = [
+                plan
+                for plan in self.sync_plans.values()
+                if plan["organization_id"] == organization_id
+            ]
+            return 200, self._page(plans, params)
+        return 404, {"error": "not found"}
@@ -0,0 +1,120 @@
+# -*- encoding: utf-8 -*-
+"""Bulk seeding of foreman-tasks for scale tests of the task procedures.
+
+Seeded tasks are inserted with ``generate_series`` in a single transaction
+run from one ``foreman-rake console`` session, which takes seconds for a
+million rows where creating tasks through the API would take days. They are
+labelled ``Actions::Testfm::Seed`` so they can be counted and removed without
+touching real tasks. Their external ids point to no dynflow execution plan.
+"""
+import re
+import time
+from collections import namedtuple
+
+from testfm.log import logger
+
+SEED_LABEL = "Actions::Testfm::Seed"
+SCALE_COUNTS = (1000, 10000, 100000, 1000000)
+
+TaskBatch = namedtuple("TaskBatch", "count state result age")
+TaskBatch.__new__.__defaults__ = ("success", 0)
+TaskBatch.__doc__ = """count tasks in state with result, started and ended age days ago"""
+
+INSERT_SQL = """INSERT INTO foreman_tasks_tasks
+    (id, type, label, started_at, ended_at, state_updated_at, state, result, external_id)
+SELECT md5(random()::text || n)::uuid::text, 'ForemanTasks::Task::DynflowTask', '{label}',
+    now() - interval '{age} days', now() - interval '{age} days',
+    now() - interval '{age} days', '{state}', '{result}', md5(n || random()::text)::uuid::text
+FROM generate_series(1, {count}) AS n"""
+
+COUNT_RUBY = (
+    "ForemanTasks::Task.where(label: '{label}').group(:state).count"
+    '.each {{ |state, count| puts "testfm-tasks #{{state}} #{{count}}" }}'
+)
+
+SEED_SCRIPT = """foreman-rake console << 'TESTFM_RUBY'
+ActiveRecord::Base.transaction do
+{inserts}
+end
+{count}
+TESTFM_RUBY"""
+
+COUNT_SCRIPT = """foreman-rake console << 'TESTFM_RUBY'
+{count}
+TESTFM_RUBY"""
+
+RESUME_LINE = re.compile(
+    r"Total tasks (found paused in error state|resumed|failed to resume|skipped): (\d+)"
+)
+RESUME_KEYS = {
+    "found paused in error state": "found",
+    "resumed": "resumed",
+    "failed to resume": "failed",
+    "skipped": "skipped",
+}
+
+REMOVE_SCRIPT = """foreman-rake console << 'TESTFM_RUBY'
+ForemanTasks::Task.where(label: '{label}').delete_all
+TESTFM_RUBY"""
+
+
+def _parse_counts(contacted):
+    """Return dict of host to dict of state to number of seeded tasks"""
+    counts = {}
+    for host, result in contacted.items():
+        assert result["rc"] == 0, result["stderr"]
+        counts[host] = {}
+        for line in result["stdout"].splitlines():
+            if line.startswith("testfm-tasks "):
+                _, state, count = line.split()
+                counts[host][state] = int(count)
+    return counts
+
+
+def seed_tasks(ansible_module, batches):
+    """Insert the tasks of every :data:`TaskBatch` in one transaction
+
+    :return: dict of host to dict of state to number of seeded tasks
+    """
+    inserts = "\n".join(
+        "ActiveRecord::Base.connection.execute(<<-SQL)\n{}\nSQL".format(
+            INSERT_SQL.format(label=SEED_LABEL, **batch._asdict())
+        )
+        for batch in batches
+    )
+    start = time.monotonic()
+    contacted = ansible_module.shell(
+        SEED_SCRIPT.format(inserts=inserts, count=COUNT_RUBY.format(label=SEED_LABEL))
+    )
+    counts = _parse_counts(contacted)
+    logger.info(
+        "seeded {} tasks in {:.1f}s: {}".format(
+            sum(batch.count for batch in batches), time.monotonic() - start, counts
+        )
+    )
+    return counts
+
+
+def count_tasks(ansible_module):
+    """Return dict of host to dict of state to number of seeded tasks left"""
+    return _parse_counts(
+        ansible_module.shell(COUNT_SCRIPT.format(count=COUNT_RUBY.format(label=SEED_LABEL)))
+    )
+
+
+def remove_seeded_tasks(ansible_module):
+    """Delete every seeded task"""
+    contacted = ansible_module.shell(REMOVE_SCRIPT.format(label=SEED_LABEL))
+    for result in contacted.values():
+        assert result["rc"] == 0, result["stderr"]
+
+
+def parse_resume_output(stdout):
+    """Return dict of 'found', 'resumed', 'failed' and 'skipped' to the number of
+    tasks the hammer task resume of foreman-tasks-resume reported"""
+    counts = {}
+    for line in stdout.splitlines():
+        match = RESUME_LINE.search(line)
+        if match:
+            counts[RESUME_KEYS[match.group(1)]] = int(match.group(2))
+    return counts
@@ -0,0 +1,155 @@
+# -*- encoding: utf-8 -*-
+"""Hammer commands run through a long-lived ``hammer shell``.
+
+Every ``hammer`` invocation boots ruby, loads all plugins and authenticates
+against the API, which takes seconds. A ``hammer --output json shell`` is kept
+running per host instead and commands are fed to it one line at a time. When
+the shell cannot be started or given the command, the command is run once with
+a fresh ``hammer`` process instead. When the shell dies or stops answering
+after it got the command, the command may have run and fails rather than run
+twice. Either way the shell is started again for the next command.
+"""
+import json
+import re
+import socket
+import time
+from collections import namedtuple
+
+from fabric import Connection
+from paramiko.ssh_exception import SSHException
+
+from testfm.constants import SERVER_HOSTNAME
+from testfm.log import logger
+
+PROMPT = "hammer>"
+ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+SHELL_COMMAND = "stty -echo; exec hammer --output json shell"
+ONE_SHOT_COMMAND = "hammer --output json {}"
+# bytes at the end of the output searched for the prompt
+PROMPT_TAIL = 256
+
+HammerResult = namedtuple("HammerResult", "rc stdout data")
+HammerResult.__doc__ = """Output of a hammer command and its parsed JSON, None if it was no JSON.
+Inside a hammer shell there is no exit code, rc is 0 if the output was JSON"""
+
+
+def _result(rc, stdout):
+    """Build a :data:`HammerResult` out of the output of a hammer command"""
+    try:
+        data = json.loads(stdout)
+    except ValueError:
+        data = None
+    if rc is None:
+        rc = 0 if data is not None else 1
+    return HammerResult(rc, stdout, data)
+
+
+class HammerShell(object):
+    """A hammer shell process kept alive on host"""
+
+    def __init__(self, host, timeout=300):
+        self.host = host
+        self.timeout = timeout
+        self.connection = None
+        self.channel = None
+
+    @property
+    def alive(self):
+        """Whether the shell is running"""
+        return self.channel is not None and not self.channel.exit_status_ready()
+
+    def start(self):
+        """Start the shell and wait for its first prompt"""
+        self.connection = Connection(self.host, "root")
+        self.connection.open()
+        self.channel = self.connection.client.get_transport().open_session()
+        self.channel.get_pty(width=4096)
+        self.channel.exec_command(SHELL_COMMAND)
+        self._read()
+
+    @staticmethod
+    def _text(raw):
+        """Decode output, without terminal escapes and carriage returns"""
+        return ANSI_RE.sub("", raw.decode("utf-8", "replace")).replace("\r", "")
+
+    def _read(self):
+        """Read up to the next prompt, return what was printed before it"""
+        deadline = time.monotonic() + self.timeout
+        raw = b""
+        # chunks may split multibyte characters, only the whole output is decoded
+        while not self._text(raw[-PROMPT_TAIL:]).rstrip().endswith(PROMPT):
+            if self.channel.recv_ready():
+                raw += self.channel.recv(65536)
+            elif self.channel.exit_status_ready():
+                raise EOFError("hammer shell on {} exited".format(self.host))
+            elif time.monotonic() > deadline:
+                raise socket.timeout("hammer shell on {} did not answer".format(self.host))
+            else:
+                time.sleep(0.05)
+        return self._text(raw).rstrip()[: -len(PROMPT)].strip()
+
+    def send(self, args):
+        """Give hammer args to the shell, starting it if needed"""
+        if not self.alive:
+            self.start()
+        self.channel.sendall("{}\n".format(args))
+
+    def receive(self, args):
+        """Return the output of hammer args, given to the shell with :meth:`send`"""
+        output = self._read()
+        # readline echoes the command line itself even with terminal echo off
+        if output.startswith(args):
+            output = output.partition(args)[2].lstrip()
+        return output
+
+    def close(self):
+        """Stop the shell"""
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Hammer(object):
+    """Runs hammer commands through one :class:`HammerShell` per host
+
+    Usage::
+
+        result = hammer.run("organization list")
+        org_ids = [org["Id"] for org in result.data]
+    """
+
+    def __init__(self, timeout=300):
+        self.timeout = timeout
+        self.shells = {}
+
+    def run(self, args, host=SERVER_HOSTNAME):
+        """Run hammer args on host
+
+        :param str args: hammer arguments without the hammer command itself
+        :return: :data:`HammerResult`
+        """
+        shell = self.shells.setdefault(host, HammerShell(host, self.timeout))
+        try:
+            shell.send(args)
+        except (EOFError, socket.timeout, SSHException, OSError) as error:
+            logger.warning("{}, running hammer {} on its own".format(error, args))
+            shell.close()
+            result = Connection(host, "root").run(
+                ONE_SHOT_COMMAND.format(args), warn=True, hide=True
+            )
+            return _result(result.exited, result.stdout)
+        try:
+            return _result(None, shell.receive(args))
+        except (EOFError, socket.timeout, SSHException, OSError):
+            # the command may have run already, running it again could repeat a change
+            shell.close()
+            raise
+
+    def close(self):
+        """Stop every shell"""
+        for shell in self.shells.values():
+            shell.close()
+        self.shells.clear()
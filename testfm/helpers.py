@@ -1,16 +1,34 @@
 # helpers required for TestFM
 import os
+import time
 
+import yaml
 from fabric import Connection
 
 from testfm.constants import SERVER_HOSTNAME
+from testfm.timing import recorder
+
+# libyaml is a lot faster on big files like data.yml, fall back to pure python without it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# prints the full resolution mtime, size and inode of path, then the content if it
+# changed since it was cached for this host, ansible renders inventory_hostname per host
+READ_YAML_SCRIPT = (
+    'stamp=$(stat -c "%y %s %i" {path}) || exit 1; echo "$stamp"; '
+    'case "{{{{ inventory_hostname }}}} $stamp" in {known}) ;; *) cat {path} ;; esac'
+)
+
+# (host, path) -> (stamp, parsed content)
+_yaml_cache = {}
 
 
 def product():
     """This helper provides Satellite/Capsule version."""
 
+    # a worker of a host pool asks its own host instead of the whole server group
+    pattern = os.environ.get("TESTFM_SERVER_HOSTNAME", "server")
     server_version = os.popen(
-        "ansible -i testfm/inventory server --user root -m shell "
+        "ansible -i testfm/inventory " + pattern + " --user root -m shell "
         '-a "rpm -q satellite > /dev/null && rpm -q satellite --queryformat=%{VERSION}'
         ' || rpm -q satellite-capsule --queryformat=%{VERSION}" -o'
     ).read()
@@ -19,7 +37,11 @@ def product():
 
 def run(command):
     """ Use this helper to execute shell command on Satellite"""
-    return Connection(SERVER_HOSTNAME, "root").run(command)
+    start = time.monotonic()
+    try:
+        return Connection(SERVER_HOSTNAME, "root").run(command)
+    finally:
+        recorder.record("command", command, start, time.monotonic(), [SERVER_HOSTNAME])
 
 
 def server():
@@ -29,3 +51,31 @@ def server():
         return "satellite"
     else:
         return "capsule"
+
+
+def read_remote_yaml(ansible_module, path):
+    """Read and parse a YAML file of every contacted host without fetching it to disk.
+
+    The file is streamed over the existing connection and parsed with libyaml.
+    Parsed content is cached by the remote mtime, size and inode, so an
+    unchanged file is neither transferred nor parsed again; do not modify the
+    returned data.
+
+    :param str path: path of the YAML file on the server
+    :return: dict of host to parsed content
+    """
+    known = "|".join(
+        '"{} {}"'.format(host, stamp)
+        for (host, cached), (stamp, _) in _yaml_cache.items()
+        if cached == path
+    )
+    contacted = ansible_module.shell(READ_YAML_SCRIPT.format(path=path, known=known or '""'))
+    content = {}
+    for host, result in contacted.items():
+        assert result["rc"] == 0, "Cannot read {} on {}".format(path, host)
+        stamp, _, text = result["stdout"].partition("\n")
+        cached = _yaml_cache.get((host, path))
+        if cached is None or cached[0] != stamp:
+            cached = _yaml_cache[(host, path)] = (stamp, yaml.load(text, Loader=YAML_LOADER))
+        content[host] = cached[1]
+    return content
@@ -0,0 +1,260 @@
+# -*- encoding: utf-8 -*-
+"""Local yum repositories standing in for the external ones tests point yum at.
+
+Small noarch packages are built with ``rpmbuild`` on the server, optionally
+signed with a throwaway gpg key, indexed with ``createrepo`` and served by a
+python HTTP server on the server itself, listening on its loopback address only.
+Repositories mirror the path of the URL they stand in for, so checks matching on
+e.g. ``yum.theforeman.org`` in a baseurl see the same thing as with the real
+repository, without reaching it.
+
+Building needs ``rpm-build``, ``createrepo`` and ``gnupg2`` on the server. When
+they are missing they are installed with yum from the repositories the server
+is already set up with, so a server without access to its base OS repositories
+needs them installed beforehand.
+"""
+from collections import namedtuple
+
+from testfm.constants import epel_repo
+from testfm.constants import upstream_url
+from testfm.log import logger
+from testfm.packages import packages_unlocked
+from testfm.readiness import Condition
+from testfm.readiness import wait_for
+
+REPO_ROOT = "/var/tmp/testfm-repos"
+REPO_ADDRESS = "127.0.0.1"
+REPO_PORT = 48080
+GPG_NAME = "testfm"
+BUILD_TOOLS = ["rpm-build", "createrepo", "gnupg2"]
+
+RepoPackage = namedtuple("RepoPackage", "name version release path content filename")
+RepoPackage.__new__.__defaults__ = ("", None)
+RepoPackage.__doc__ = """A noarch package installing a single file path with content,
+copied into its repository as filename if given"""
+
+LocalRepo = namedtuple("LocalRepo", "path packages signed createrepo")
+LocalRepo.__new__.__defaults__ = (False, True)
+LocalRepo.__doc__ = """A repository served below path, signed with the testfm key if
+signed and indexed unless createrepo is False"""
+
+PACKAGE_SPEC = """Name: {name}
+Version: {version}
+Release: {release}
+Summary: testfm stand-in of {name}
+License: GPLv2
+BuildArch: noarch
+
+%description
+Stand-in of {name} built by testfm.
+
+%install
+mkdir -p $(dirname %{{buildroot}}{path})
+cat > %{{buildroot}}{path} << 'TESTFM_CONTENT'
+{content}
+TESTFM_CONTENT
+
+%files
+{path}
+"""
+
+GPG_PARAMS = """%no-protection
+Key-Type: RSA
+Key-Length: 2048
+Name-Real: {name}
+Name-Email: {name}@localhost
+Expire-Date: 0
+%commit
+"""
+
+SETUP_SCRIPT = """set -e
+rm -rf {root}
+mkdir -p {root}/build/SPECS {root}/www
+mkdir -m 700 {root}/gnupg
+export GNUPGHOME={root}/gnupg
+cat > {root}/gnupg/params << 'TESTFM_PARAMS'
+{params}TESTFM_PARAMS
+# gpg 2.0 does not know %no-protection and never asks for a passphrase in batch mode
+gpg --batch --gen-key {root}/gnupg/params 2>/dev/null ||
+    sed '/%no-protection/d' {root}/gnupg/params | gpg --batch --gen-key
+gpg --armor --export {gpg_name} > {root}/www/RPM-GPG-KEY-{gpg_name}"""
+
+PACKAGE_SCRIPT = """cat > {root}/build/SPECS/{name}.spec << 'TESTFM_SPEC'
+{spec}TESTFM_SPEC
+rpmbuild -bb --quiet --define '_topdir {root}/build' {root}/build/SPECS/{name}.spec
+mkdir -p {root}/www/{repo}
+cp {root}/build/RPMS/noarch/{name}-{version}-{release}.noarch.rpm \\
+    {root}/www/{repo}/{target}"""
+
+SIGN_SCRIPT = (
+    "echo | setsid rpm --define '_gpg_name {gpg_name}' --define '_gpg_path {root}/gnupg' "
+    "--addsign {root}/www/{path}/*.rpm"
+)
+
+CREATEREPO_SCRIPT = "createrepo --quiet {root}/www/{path}"
+
+# SimpleHTTPServer of python 2 has no option to choose the address it listens on
+SERVE_SCRIPT = """cd {root}/www
+if command -v python3 > /dev/null; then
+    setsid nohup python3 -m http.server --bind {address} {port} \\
+        > {root}/http.log 2>&1 < /dev/null &
+else
+    setsid nohup python -c 'import BaseHTTPServer, SimpleHTTPServer
+BaseHTTPServer.HTTPServer(("{address}", {port}),
+    SimpleHTTPServer.SimpleHTTPRequestHandler).serve_forever()' \\
+        > {root}/http.log 2>&1 < /dev/null &
+fi
+echo $! > {root}/http.pid"""
+
+STOP_SCRIPT = "[ -f {root}/http.pid ] && kill $(cat {root}/http.pid); rm -rf {root}"
+
+
+def mirror_path(url):
+    """Return url without its scheme, the path a stand-in of url is served below"""
+    return url.split("://", 1)[-1].strip("/")
+
+
+class LocalRepoServer(object):
+    """Builds the stand-in repositories on first use and serves them until stopped
+
+    Usage::
+
+        local_repos.start(ansible_module)
+        ansible_module.yum_repository(name="hotfix_repo", baseurl=local_repos.url("hotfix"))
+    """
+
+    def __init__(self, root=REPO_ROOT, port=REPO_PORT, address=REPO_ADDRESS):
+        self.root = root
+        self.port = port
+        self.address = address
+        self.started = False
+        self._ansible_module = None
+
+    @property
+    def base_url(self):
+        """URL the repositories are served below"""
+        return "http://{}:{}".format(self.address, self.port)
+
+    @property
+    def gpg_key_url(self):
+        """URL of the public key the signed repositories are signed with"""
+        return self.url("RPM-GPG-KEY-{}".format(GPG_NAME))
+
+    def url(self, path):
+        """Return the URL path is served at"""
+        return "{}/{}".format(self.base_url, path.strip("/"))
+
+    def mirror(self, url):
+        """Return the URL of the stand-in of url"""
+        return self.url(mirror_path(url))
+
+    def repos(self):
+        """Return the stand-in repositories: hotfix, upstream Foreman/Katello and EPEL"""
+        epel_path = "dl.fedoraproject.org/pub/epel/7/x86_64"
+        epel_repo_file = "\n".join(
+            [
+                "[epel]",
+                "name=testfm stand-in of EPEL",
+                "baseurl={}".format(self.url(epel_path)),
+                "enabled=1",
+                "gpgcheck=1",
+                "gpgkey={}".format(self.gpg_key_url),
+            ]
+        )
+        repos = [
+            LocalRepo(
+                "hotfix",
+                [
+                    RepoPackage(
+                        "hotfix-package", "1.0", "1.HOTFIXRHBZ0", "/usr/share/testfm/hotfix"
+                    )
+                ],
+            ),
+            LocalRepo(
+                epel_path,
+                [RepoPackage("testfm-epel", "1.0", "1", "/usr/share/testfm/epel")],
+                signed=True,
+            ),
+            LocalRepo(
+                mirror_path(epel_repo).rsplit("/", 1)[0],
+                [
+                    RepoPackage(
+                        "epel-release",
+                        "7",
+                        "1",
+                        "/etc/yum.repos.d/epel.repo",
+                        epel_repo_file,
+                        epel_repo.rsplit("/", 1)[1],
+                    )
+                ],
+                signed=True,
+                createrepo=False,
+            ),
+        ]
+        for name, url in sorted(upstream_url.items()):
+            package = "testfm-{}".format(name.replace("_", "-"))
+            repos.append(
+                LocalRepo(
+                    mirror_path(url),
+                    [RepoPackage(package, "1.0", "1", "/usr/share/testfm/{}".format(package))],
+                    signed=True,
+                )
+            )
+        return repos
+
+    def script(self):
+        """Return the shell script building and serving every repository"""
+        steps = [
+            SETUP_SCRIPT.format(
+                root=self.root, gpg_name=GPG_NAME, params=GPG_PARAMS.format(name=GPG_NAME)
+            )
+        ]
+        for repo in self.repos():
+            for package in repo.packages:
+                target = package.filename or "{}-{}-{}.noarch.rpm".format(
+                    package.name, package.version, package.release
+                )
+                spec = PACKAGE_SPEC.format(**package._asdict())
+                steps.append(
+                    PACKAGE_SCRIPT.format(
+                        root=self.root,
+                        repo=repo.path,
+                        spec=spec,
+                        target=target,
+                        **package._asdict()
+                    )
+                )
+            if repo.signed:
+                steps.append(SIGN_SCRIPT.format(root=self.root, gpg_name=GPG_NAME, path=repo.path))
+            if repo.createrepo:
+                steps.append(CREATEREPO_SCRIPT.format(root=self.root, path=repo.path))
+        steps.append(SERVE_SCRIPT.format(root=self.root, address=self.address, port=self.port))
+        return "\n".join(steps)
+
+    def start(self, ansible_module):
+        """Build and serve the repositories unless already done in this session"""
+        self._ansible_module = ansible_module
+        if self.started:
+            return self
+        contacted = ansible_module.command("rpm -q {}".format(" ".join(BUILD_TOOLS)))
+        if any(result["rc"] != 0 for result in contacted.values()):
+            with packages_unlocked(ansible_module):
+                contacted = ansible_module.yum(name=BUILD_TOOLS, state="present")
+                for result in contacted.values():
+                    assert result["rc"] == 0, result.get("msg")
+        contacted = ansible_module.shell(self.script())
+        for result in contacted.values():
+            logger.info(result["stdout"])
+            assert result["rc"] == 0, result["stderr"]
+        wait_for(
+            ansible_module,
+            [Condition("local repositories", "curl -sf {}".format(self.gpg_key_url), 30)],
+        )
+        self.started = True
+        return self
+
+    def stop(self):
+        """Stop serving and remove the repositories"""
+        if self._ansible_module is not None:
+            self._ansible_module.shell(STOP_SCRIPT.format(root=self.root))
+        self.started = False
@@ -18,7 +18,23 @@ Subcommands:
 Options:
     -h, --help                    print help
 """
+from contextlib import contextmanager
+
 from testfm.base import Base
+from testfm.log import logger
+
+RPM_SNAPSHOT_COMMAND = (
+    "date +%s.%N; rpm -qa --queryformat "
+    "'%{NAME}\\t%|EPOCH?{%{EPOCH}}:{0}|:%{VERSION}-%{RELEASE}\\t%{ARCH}\\n'"
+)
+
+LOCKED_STATUS = (
+    "Packages are locked.",
+    "Automatic locking of package versions is enabled in installer.",
+)
+
+# lock state shared by nested packages_unlocked() blocks, set up by the outermost one
+_unlocked = {"depth": 0, "locked": False}
 
 
 class Packages(Base):
@@ -169,3 +185,135 @@ class Packages(Base):
         result = cls._construct_command(options)
 
         return result
+
+
+def _assert_passed(contacted):
+    """Assert that a packages command passed on every host"""
+    for result in contacted.values():
+        logger.info(result["stdout"])
+        assert "FAIL" not in result["stdout"]
+        assert result["rc"] == 0
+
+
+@contextmanager
+def packages_unlocked(ansible_module):
+    """Keep the packages unlocked within the block
+
+    The lock state is queried once by the outermost block, which unlocks the
+    packages only if they were locked and locks them again on exit. Nested
+    blocks, e.g. of fixtures used by the same test, reuse that state and
+    neither query, unlock nor lock again.
+
+    Usage::
+
+        with packages_unlocked(ansible_module):
+            ansible_module.yum(name="zsh", state="present")
+
+    :return: whether the packages were locked before
+    """
+    if _unlocked["depth"] == 0:
+        contacted = ansible_module.command(Packages.is_locked())
+        _unlocked["locked"] = all(result["rc"] == 0 for result in contacted.values())
+        if _unlocked["locked"]:
+            _assert_passed(ansible_module.command(Packages.unlock()))
+    _unlocked["depth"] += 1
+    try:
+        yield _unlocked["locked"]
+    finally:
+        _unlocked["depth"] -= 1
+        if _unlocked["depth"] == 0 and _unlocked["locked"]:
+            _unlocked["locked"] = False
+            _assert_passed(ansible_module.command(Packages.lock()))
+
+
+def lock_package_versions(ansible_module):
+    """Lock packages through the installer unless they are locked with locking enabled
+
+    :return: the ansible result of foreman-maintain packages status
+    """
+    contacted = ansible_module.command(Packages.status())
+    if all(
+        all(line in result["stdout"] for line in LOCKED_STATUS) for result in contacted.values()
+    ):
+        logger.info("packages locked and locking enabled, skipping the installer")
+        return contacted
+    for result in ansible_module.command("satellite-installer --lock-package-versions").values():
+        logger.info(result["stdout"])
+        assert result["rc"] == 0
+    return ansible_module.command(Packages.status())
+
+
+class RpmSnapshot(object):
+    """Installed packages of a host at one point in time
+
+    The packages are kept as a sorted list of (name, epoch:version-release,
+    arch) tuples with an index of each name to its range in the list, so two
+    snapshots are compared in a single merge pass.
+
+    Usage::
+
+        before = RpmSnapshot.take(ansible_module)
+        ansible_module.command("yum install -y zsh")
+        for host, after in RpmSnapshot.take(ansible_module).items():
+            assert "zsh" in before[host].diff(after)["added"]
+    """
+
+    def __init__(self, host, lines):
+        self.host = host
+        self.timestamp = float(lines[0])
+        self.packages = sorted(tuple(line.split("\t")) for line in lines[1:] if line)
+        self.index = {}
+        for position, package in enumerate(self.packages):
+            start, _ = self.index.get(package[0], (position, None))
+            self.index[package[0]] = (start, position + 1)
+
+    @classmethod
+    def take(cls, ansible_module):
+        """Take a snapshot of every contacted host with a single rpm query
+
+        :return: dict of host to :class:`RpmSnapshot`
+        """
+        contacted = ansible_module.shell(RPM_SNAPSHOT_COMMAND)
+        return {host: cls(host, result["stdout_lines"]) for host, result in contacted.items()}
+
+    def __len__(self):
+        return len(self.packages)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def versions(self, name):
+        """Return the installed 'epoch:version-release.arch' of package name"""
+        start, end = self.index.get(name, (0, 0))
+        return ["{}.{}".format(evr, arch) for _, evr, arch in self.packages[start:end]]
+
+    def diff(self, other):
+        """Compare with a later snapshot of the same host
+
+        :return: dict with the 'added' and 'removed' package names mapped to
+            their versions, 'changed' mapping names present in both to their
+            (old, new) versions and the 'elapsed' seconds between the snapshots
+        """
+        changed = set()
+        first, second = self.packages, other.packages
+        i = j = 0
+        while i < len(first) or j < len(second):
+            if j == len(second) or (i < len(first) and first[i] < second[j]):
+                changed.add(first[i][0])
+                i += 1
+            elif i == len(first) or second[j] < first[i]:
+                changed.add(second[j][0])
+                j += 1
+            else:
+                i += 1
+                j += 1
+        return {
+            "added": {name: other.versions(name) for name in changed if name not in self},
+            "removed": {name: self.versions(name) for name in changed if name not in other},
+            "changed": {
+                name: (self.versions(name), other.versions(name))
+                for name in changed
+                if name in self and name in other
+            },
+            "elapsed": other.timestamp - self.timestamp,
+        }
@@ -0,0 +1,141 @@
+# -*- encoding: utf-8 -*-
+"""Backup/restore round trip run as a pipeline of timed, checkpointed stages.
+
+The stages are ``backup``, ``mutate``, ``restore`` and ``verify``. Completed
+stages are recorded in a checkpoint, optionally persisted in the pytest cache,
+so running the pipeline again after a failure resumes at the failed stage and
+retries a restore from the saved backup instead of taking a new one.
+"""
+import time
+
+from testfm.backup import Backup
+from testfm.health import Health
+from testfm.log import logger
+from testfm.restore import Restore
+
+STAGES = ("backup", "mutate", "restore", "verify")
+
+
+def assert_succeeded(contacted):
+    """Assert that a foreman-maintain command passed on every host"""
+    for result in contacted.values():
+        logger.info(result["stdout"])
+        assert "FAIL" not in result["stdout"]
+        assert result["rc"] == 0
+
+
+class RoundTrip(object):
+    """Chains backup, optional data mutation, restore and verification
+
+    :param ansible_module: ansible module of the host under test
+    :param str backup_dir: directory the backup is preserved in
+    :param str mode: backup mode, 'online' or 'offline'
+    :param mutate: optional callable(ansible_module, backup_dir) changing data
+        after the backup was taken
+    :param verify: optional callable(ansible_module, backup_dir) asserting the
+        restored state, run after the server-ping health check
+    :param cache: pytest cache to persist the checkpoint in between runs
+    :param str key: cache key of the checkpoint
+    """
+
+    backup_commands = {
+        "online": Backup.run_online_backup,
+        "offline": Backup.run_offline_backup,
+    }
+
+    def __init__(
+        self,
+        ansible_module,
+        backup_dir,
+        mode="online",
+        mutate=None,
+        verify=None,
+        cache=None,
+        key="testfm/round_trip",
+    ):
+        self.ansible_module = ansible_module
+        self.mode = mode
+        self.mutate = mutate
+        self.verify = verify
+        self.cache = cache
+        self.key = key
+        self.checkpoint = {"backup_dir": backup_dir, "done": [], "timings": {}}
+        if cache is not None:
+            saved = cache.get(key, None)
+            if saved and saved["backup_dir"] == backup_dir and self._backup_exists(backup_dir):
+                self.checkpoint = saved
+
+    @property
+    def backup_dir(self):
+        """Directory the backup is preserved in"""
+        return self.checkpoint["backup_dir"]
+
+    @property
+    def timings(self):
+        """Seconds spent in each completed stage"""
+        return self.checkpoint["timings"]
+
+    def _backup_exists(self, backup_dir):
+        """Check that a complete backup is still around on every host"""
+        contacted = self.ansible_module.stat(path="{}/metadata.yml".format(backup_dir))
+        return all(result["stat"]["exists"] for result in contacted.values())
+
+    def _save(self):
+        """Persist the checkpoint"""
+        if self.cache is not None:
+            self.cache.set(self.key, self.checkpoint)
+
+    def stage_backup(self):
+        """Take the backup into backup_dir"""
+        self.ansible_module.file(path=self.backup_dir, state="directory", owner="postgres")
+        assert_succeeded(
+            self.ansible_module.command(
+                self.backup_commands[self.mode](["-y", "--preserve-directory", self.backup_dir])
+            )
+        )
+
+    def stage_mutate(self):
+        """Change data the restore is expected to revert"""
+        if self.mutate is not None:
+            self.mutate(self.ansible_module, self.backup_dir)
+
+    def stage_restore(self):
+        """Restore the backup taken in the backup stage"""
+        assert_succeeded(
+            self.ansible_module.command(Restore._construct_command(["-y", self.backup_dir]))
+        )
+
+    def stage_verify(self):
+        """Check the server is healthy and in the backed up state"""
+        assert_succeeded(
+            self.ansible_module.command(Health.check({"label": "server-ping", "assumeyes": True}))
+        )
+        if self.verify is not None:
+            self.verify(self.ansible_module, self.backup_dir)
+
+    def run(self):
+        """Run every stage not completed yet, return the stage timings"""
+        for stage in STAGES:
+            if stage in self.checkpoint["done"]:
+                logger.info("round trip: {} already done, skipping".format(stage))
+                continue
+            start = time.monotonic()
+            try:
+                getattr(self, "stage_{}".format(stage))()
+            finally:
+                self.timings[stage] = time.monotonic() - start
+                logger.info("round trip: {} took {:.1f}s".format(stage, self.timings[stage]))
+            self.checkpoint["done"].append(stage)
+            self._save()
+        return self.timings
+
+    def retry(self, stage="restore"):
+        """Forget stage and every later one, so the next run starts over from it"""
+        earlier = STAGES[: STAGES.index(stage)]
+        self.checkpoint["done"] = [done for done in self.checkpoint["done"] if done in earlier]
+        self._save()
+
+    def clear(self):
+        """Drop the persisted checkpoint"""
+        if self.cache is not None:
+            self.cache.set(self.key, None)
@@ -0,0 +1,418 @@
+# -*- encoding: utf-8 -*-
+"""Timelines of what happens on the server while a command runs.
+
+A sampler loop runs on the server next to the profiled command and records the
+output of a probe with nanosecond timestamps. State changes are therefore seen
+at a much finer granularity than polling with one ansible call per sample
+would allow, and the whole profile costs a single remote call.
+"""
+import json
+import time
+from shlex import quote
+
+from testfm.advanced import Advanced
+from testfm.constants import foreman_maintain_data_yml
+from testfm.health import Health
+from testfm.helpers import read_remote_yaml
+from testfm.log import logger
+from testfm.maintenance_mode import MaintenanceMode
+from testfm.service import parse_service_list
+from testfm.service import Service
+from testfm.timing import recorder
+from testfm.upgrade import parse_upgrade_output
+from testfm.upgrade import Upgrade
+from testfm.upgrade import UpgradeCheck
+
+PROFILE_SCRIPT = """log=$(mktemp /tmp/testfm-profile.XXXXXX)
+( while :; do echo "@ $(date +%s.%N)"; {probe}; sleep {interval}; done ) >> $log 2>/dev/null &
+sampler=$!
+echo "# start $(date +%s.%N)" >> $log
+{command} > $log.out 2>&1
+rc=$?
+echo "# done $(date +%s.%N) $rc" >> $log
+{wait_until}
+kill $sampler; wait $sampler 2> /dev/null
+cat $log; sed 's/^/> /' $log.out
+rm -f $log $log.out
+exit $rc"""
+
+UNTIL_SCRIPT = """deadline=$(( $(date +%s) + {timeout} ))
+while [ $(date +%s) -lt $deadline ]; do
+    if {until} > /dev/null 2>&1; then echo "# ready $(date +%s.%N)" >> $log; break; fi
+    sleep {interval}
+done"""
+
+UNIT_STATES_PROBE = (
+    "systemctl show -p Id -p ActiveState {units} | "
+    "awk -F= '/^Id=/ {{id=$2}} /^ActiveState=/ {{state=$2}} /^$/ {{print id, state}} "
+    "END {{print id, state}}'"
+)
+
+STOPPED_STATES = ("inactive", "failed")
+
+# script gives the command a terminal, so it writes every line as soon as it is done,
+# the first line is the time the command started
+TIMESTAMP_SCRIPT = (
+    "date +%s.%N; set -o pipefail; script -qfec {command} /dev/null | "
+    'while IFS= read -r line; do echo "$(date +%s.%N) $line"; done'
+)
+
+# firewall chain, crond state and number of sync plans foreman-maintain disabled
+MAINTENANCE_MODE_PROBE = (
+    "{{ iptables-save; nft list ruleset; }} 2>/dev/null | grep -q FOREMAN_MAINTAIN "
+    "&& echo chain present || echo chain absent; "
+    "echo crond $(systemctl is-active crond); "
+    "echo disabled $(awk '/^ *:disabled:/ {{d=1; next}} d && /^ *- / {{n++; next}} "
+    "{{d=0}} END {{print n+0}}' {data_yml})"
+)
+
+
+class Timeline(object):
+    """Samples and markers recorded on one host while a command ran
+
+    :ivar samples: list of (timestamp, key, value) probe samples
+    :ivar markers: dict of marker name ('start', 'done', 'ready') to timestamp
+    :ivar output: output lines of the profiled command
+    :ivar rc: return code of the profiled command
+    """
+
+    def __init__(self, host, lines):
+        self.host = host
+        self.samples = []
+        self.markers = {}
+        self.output = []
+        self.rc = None
+        timestamp = None
+        for line in lines:
+            if line.startswith("> "):
+                self.output.append(line[2:])
+            elif line.startswith("@ "):
+                timestamp = float(line[2:])
+            elif line.startswith("# "):
+                fields = line[2:].split()
+                self.markers[fields[0]] = float(fields[1])
+                if fields[0] == "done":
+                    self.rc = int(fields[2])
+            elif timestamp is not None and line.strip():
+                key, _, value = line.partition(" ")
+                self.samples.append((timestamp, key, value.strip()))
+
+    def first(self, key, values, after=None):
+        """Return the first timestamp key was sampled with one of values, None if never"""
+        for timestamp, sampled_key, value in self.samples:
+            if after is not None and timestamp < after:
+                continue
+            if sampled_key == key and value in values:
+                return timestamp
+        return None
+
+    def changes(self, key):
+        """Return the (timestamp, value) samples of key at which its value changed"""
+        changes = []
+        for timestamp, sampled_key, value in self.samples:
+            if sampled_key == key and (not changes or changes[-1][1] != value):
+                changes.append((timestamp, value))
+        return changes
+
+    def elapsed(self, timestamp):
+        """Seconds from the start of the command to timestamp, None stays None"""
+        if timestamp is None:
+            return None
+        return timestamp - self.markers["start"]
+
+
+def profile(ansible_module, command, probe, interval=0.1, until="", timeout=600):
+    """Run command on the server while sampling probe every interval seconds
+
+    :param str command: the command to profile
+    :param str probe: shell snippet printing 'key value' lines
+    :param float interval: seconds between two samples
+    :param str until: optional command polled after command finished until it
+        passes or timeout seconds elapsed, marked as 'ready'
+    :return: dict of host to :class:`Timeline`
+    """
+    wait_until = ""
+    if until:
+        wait_until = UNTIL_SCRIPT.format(until=until, interval=interval, timeout=timeout)
+    script = PROFILE_SCRIPT.format(
+        command=command, probe=probe, interval=interval, wait_until=wait_until
+    )
+    contacted = ansible_module.shell(script)
+    return {
+        host: Timeline(host, result["stdout"].splitlines()) for host, result in contacted.items()
+    }
+
+
+def enabled_services(ansible_module):
+    """Return dict of host to the enabled units foreman-maintain manages, templates left out"""
+    return {
+        host: [
+            unit
+            for unit, state in parse_service_list(result["stdout"]).items()
+            if state.enabled and "@." not in unit
+        ]
+        for host, result in ansible_module.command(Service.service_list()).items()
+    }
+
+
+def list_services(ansible_module):
+    """Return the enabled units foreman-maintain manages, templates left out"""
+    return sorted(set().union(*enabled_services(ansible_module).values()))
+
+
+def restart_latency(ansible_module, units, command, health=True, interval=0.1):
+    """Profile command restarting units
+
+    :return: dict of host to dict of unit to seconds from the start of command
+        until the unit was first seen 'stop'ped and 'active' again, plus the
+        seconds until server-ping passed as 'healthy'; None for what was not
+        observed within the sampling interval or the timeout
+    """
+    until = Health.check({"label": "server-ping", "assumeyes": True}) if health else ""
+    timelines = profile(
+        ansible_module,
+        command,
+        UNIT_STATES_PROBE.format(units=" ".join(units)),
+        interval=interval,
+        until=until,
+    )
+    report = {}
+    for host, timeline in timelines.items():
+        healthy = timeline.elapsed(timeline.markers.get("ready"))
+        report[host] = {}
+        for unit in units:
+            stopped = timeline.first(unit, STOPPED_STATES, after=timeline.markers["start"])
+            # a restart faster than one interval is not seen at all
+            active = None
+            if stopped is not None:
+                active = timeline.first(unit, ("active",), after=stopped)
+            report[host][unit] = {
+                "stop": timeline.elapsed(stopped),
+                "active": timeline.elapsed(active),
+                "healthy": healthy,
+            }
+    return report
+
+
+def profile_service_restart(ansible_module, units=None, health=True, interval=0.1):
+    """Restart every service on its own with --only and then all of them together
+
+    :return: dict of scenario (the service name or 'all') to the report of
+        :func:`restart_latency`
+    """
+    if units is None:
+        units = list_services(ansible_module)
+    scenarios = {}
+    for unit in units:
+        name = unit[: -len(".service")] if unit.endswith(".service") else unit
+        scenarios[name] = restart_latency(
+            ansible_module, [unit], Service.service_restart({"only": name}), health, interval
+        )
+    scenarios["all"] = restart_latency(
+        ansible_module, units, Service.service_restart(), health, interval
+    )
+    for scenario, report in scenarios.items():
+        for host, latencies in report.items():
+            for unit, latency in latencies.items():
+                logger.info("restart {}: {} {} {}".format(scenario, host, unit, latency))
+    return scenarios
+
+
+def maintenance_mode_transition(ansible_module, command, chain, crond, interval=0.1):
+    """Profile a maintenance-mode start or stop
+
+    :param str command: the maintenance-mode command
+    :param str chain: expected FOREMAN_MAINTAIN chain state, 'present' or 'absent'
+    :param tuple crond: expected crond states
+    :return: dict of host to dict with the seconds from the start of command
+        until the 'chain' and 'crond' reached the expected state, the
+        'sync_plans' list of (seconds, disabled count) changes and the 'done'
+        seconds the command took; None for what was not observed
+    """
+    timelines = profile(
+        ansible_module,
+        command,
+        MAINTENANCE_MODE_PROBE.format(data_yml=foreman_maintain_data_yml),
+        interval=interval,
+    )
+    report = {}
+    for host, timeline in timelines.items():
+        start = timeline.markers["start"]
+        report[host] = {
+            "chain": timeline.elapsed(timeline.first("chain", (chain,), after=start)),
+            "crond": timeline.elapsed(timeline.first("crond", crond, after=start)),
+            "sync_plans": [
+                (timeline.elapsed(timestamp), int(count))
+                for timestamp, count in timeline.changes("disabled")
+                if timestamp >= start
+            ],
+            "done": timeline.elapsed(timeline.markers.get("done")),
+            "rc": timeline.rc,
+        }
+    return report
+
+
+def profile_maintenance_mode(ansible_module, interval=0.1):
+    """Start and stop maintenance-mode and timestamp each of their side effects
+
+    :return: dict of 'start' and 'stop' to the report of
+        :func:`maintenance_mode_transition`
+    """
+    transitions = {
+        "start": maintenance_mode_transition(
+            ansible_module, MaintenanceMode.start(), "present", STOPPED_STATES, interval
+        ),
+        "stop": maintenance_mode_transition(
+            ansible_module, MaintenanceMode.stop(), "absent", ("active",), interval
+        ),
+    }
+    for transition, report in transitions.items():
+        for host, timings in report.items():
+            logger.info("maintenance-mode {}: {} {}".format(transition, host, timings))
+    return transitions
+
+
+def profile_upgrade(ansible_module, command):
+    """Run an upgrade check or run with every output line timestamped on the server
+
+    :return: dict of host to dict with the 'rc' of command, its 'phases', see
+        :func:`testfm.upgrade.parse_upgrade_output`, the timestamp it started at as
+        'origin' and its timestamped 'output' lines
+    """
+    contacted = ansible_module.shell(TIMESTAMP_SCRIPT.format(command=quote(command)))
+    report = {}
+    for host, result in contacted.items():
+        output = result["stdout"].splitlines()
+        origin = float(output.pop(0))
+        lines = []
+        for line in output:
+            timestamp, _, text = line.partition(" ")
+            lines.append((float(timestamp), text))
+        phases = parse_upgrade_output(lines)
+        for phase in phases:
+            if phase.duration is not None:
+                recorder.record_remote("phase", phase.name, phase.start, phase.end, host, origin)
+            for step in phase.steps:
+                if step.duration is not None:
+                    recorder.record_remote("step", step.name, step.start, step.end, host, origin)
+        report[host] = {"rc": result["rc"], "phases": phases, "origin": origin, "output": lines}
+    return report
+
+
+def check_matrix(ansible_module, versions=None, options=None):
+    """Run upgrade check to every target version with :func:`profile_upgrade`
+
+    The checks of one server run one after another, as concurrent checks
+    would share the foreman-maintain data.yml and the yum lock, and
+    --assumeyes may run fix procedures. Servers are still checked in parallel.
+
+    :param list versions: target versions, by default every one of list-versions
+    :param dict options: further options of upgrade check
+    :return: dict of host to dict of version to :class:`testfm.upgrade.UpgradeCheck`
+    """
+    if versions is None:
+        contacted = ansible_module.command(Upgrade.list_versions())
+        versions = contacted.values()[0]["stdout_lines"]
+    matrix = {}
+    for version in versions:
+        check_options = {"target-version": version, "assumeyes": True}
+        check_options.update(options or {})
+        report = profile_upgrade(ansible_module, Upgrade.check(check_options))
+        for host, profile in report.items():
+            lines = profile["output"]
+            end = lines[-1][0] if lines else profile["origin"]
+            check = UpgradeCheck(
+                version,
+                profile["rc"],
+                end - profile["origin"],
+                [text for _, text in lines],
+                profile["phases"],
+            )
+            matrix.setdefault(host, {})[version] = check
+            logger.info(
+                "upgrade check to {} on {}: rc {} in {:.1f}s, failed {}".format(
+                    version, host, check.rc, check.duration, check.failed
+                )
+            )
+    return matrix
+
+
+def upgrade_timeline(phases):
+    """Return the JSON serializable timeline of upgrade phases, in seconds from the start"""
+    origin = phases[0].start if phases else 0.0
+    return [
+        {
+            "phase": phase.key,
+            "name": phase.name,
+            "start": phase.start - origin,
+            "duration": phase.duration,
+            "steps": [
+                {"name": step.name, "status": step.status, "duration": step.duration}
+                for step in phase.steps
+            ],
+        }
+        for phase in phases
+    ]
+
+
+def write_upgrade_timeline(path, phases):
+    """Write the timeline of upgrade phases to path as JSON"""
+    with open(path, "w") as f:
+        json.dump(upgrade_timeline(phases), f, indent=2)
+
+
+def compare_upgrade_timelines(timelines):
+    """Line up the phase durations of several upgrade timelines
+
+    :param dict timelines: label, like the target version, to timeline
+    :return: dict of phase to dict of label to seconds, phases missing from a
+        timeline left out
+    """
+    durations = {}
+    for label, timeline in timelines.items():
+        for phase in timeline:
+            durations.setdefault(phase["phase"], {})[label] = phase["duration"]
+    for phase, by_label in sorted(durations.items()):
+        logger.info("upgrade phase {}: {}".format(phase, by_label))
+    return durations
+
+
+def sync_plans_throughput(ansible_module, sync_ids):
+    """Time the sync-plans-disable and sync-plans-enable procedures end to end
+
+    :param list sync_ids: ids of the enabled sync plans
+    :return: dict of host to dict of 'disable' and 'enable' to the 'seconds'
+        the procedure took, the 'plans_per_second' and the sync plans 'missing'
+        from the list data.yml tracks after it
+    """
+    procedures = (
+        ("disable", Advanced.run_sync_plans_disable(), ":disabled"),
+        ("enable", Advanced.run_sync_plans_enable(), ":enabled"),
+    )
+    report = {}
+    for procedure, command, key in procedures:
+        contacted, seconds = timed(ansible_module, command)
+        for result in contacted.values():
+            logger.info(result["stdout"])
+            assert "FAIL" not in result["stdout"]
+            assert result["rc"] == 0
+        for host, data_yml in read_remote_yaml(ansible_module, foreman_maintain_data_yml).items():
+            tracked = data_yml[":default"][":sync_plans"][key]
+            report.setdefault(host, {})[procedure] = {
+                "seconds": seconds,
+                "plans_per_second": len(sync_ids) / seconds,
+                "missing": sorted(set(sync_ids) - set(tracked)),
+            }
+            logger.info(
+                "sync-plans-{} of {} plans on {}: {:.1f}s, {:.1f} plans/s".format(
+                    procedure, len(sync_ids), host, seconds, len(sync_ids) / seconds
+                )
+            )
+    return report
+
+
+def timed(ansible_module, command):
+    """Run command, return its ansible result and the seconds it took"""
+    start = time.monotonic()
+    contacted = ansible_module.command(command)
+    return contacted, time.monotonic() - start
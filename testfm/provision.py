@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+"""Python tools the tests need on the server, installed offline once per session.
+
+The wheels of every tool, and of a pip able to install them, are downloaded
+once into a wheel cache on the controller, or put there beforehand for a fully
+offline run. They are copied to the server and installed with ``--no-index``
+only when a quick import shows the tool is missing, so neither
+``bootstrap.pypa.io`` nor PyPI is contacted from the server and the system pip
+is left alone.
+"""
+import glob
+import os
+import subprocess
+import sys
+
+from testfm.log import logger
+
+WHEEL_CACHE = os.path.expanduser("~/.cache/testfm/wheels")
+REMOTE_WHEELS = "/var/tmp/testfm-wheels"
+# the last pip and the tool versions still supporting the python 2.7 of EL7
+PIP = "pip==20.3.4"
+TOOLS = {"pexpect": ["pexpect==4.8.0", "ptyprocess==0.7.0"]}
+
+CHECK_SCRIPT = 'python -c "import {module}"'
+INSTALL_SCRIPT = (
+    "python $(ls {wheels}/pip-*.whl)/pip install --no-index --find-links {wheels} {requirements}"
+)
+
+
+def _wheel(requirement, wheel_cache):
+    """Return the cached wheel of a pinned requirement, None if it is not cached"""
+    name, version = requirement.split("==")
+    wheels = glob.glob(os.path.join(wheel_cache, "{}-{}-*.whl".format(name, version)))
+    return wheels[0] if wheels else None
+
+
+def fill_wheel_cache(requirements, wheel_cache=WHEEL_CACHE):
+    """Download the python 2.7 wheels of requirements missing from the controller's cache"""
+    missing = [requirement for requirement in requirements if not _wheel(requirement, wheel_cache)]
+    if not missing:
+        return
+    logger.info("downloading {} into {}".format(", ".join(missing), wheel_cache))
+    subprocess.check_call(
+        [sys.executable, "-m", "pip", "download", "--no-deps", "--only-binary=:all:"]
+        + ["--python-version", "27", "--dest", wheel_cache]
+        + missing
+    )
+
+
+class Provisioner(object):
+    """Installs tools on the server from the controller's wheel cache
+
+    Usage::
+
+        provisioner.ensure(ansible_module, "pexpect")
+    """
+
+    def __init__(self, wheel_cache=WHEEL_CACHE):
+        self.wheel_cache = wheel_cache
+        self.ready = set()
+
+    def ensure(self, ansible_module, tool):
+        """Install tool unless it was already found or installed in this session"""
+        if tool in self.ready:
+            return
+        contacted = ansible_module.shell(CHECK_SCRIPT.format(module=tool))
+        if all(result["rc"] == 0 for result in contacted.values()):
+            logger.info("{} already installed".format(tool))
+            self.ready.add(tool)
+            return
+        requirements = [PIP] + TOOLS[tool]
+        fill_wheel_cache(requirements, self.wheel_cache)
+        ansible_module.file(path=REMOTE_WHEELS, state="directory")
+        for requirement in requirements:
+            ansible_module.copy(src=_wheel(requirement, self.wheel_cache), dest=REMOTE_WHEELS)
+        contacted = ansible_module.shell(
+            INSTALL_SCRIPT.format(wheels=REMOTE_WHEELS, requirements=" ".join(TOOLS[tool]))
+        )
+        for result in contacted.values():
+            logger.info(result["stdout"])
+            assert result["rc"] == 0, result["stderr"]
+        self.ready.add(tool)
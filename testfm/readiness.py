@@ -0,0 +1,166 @@
+# -*- encoding: utf-8 -*-
+"""Wait until the server is ready instead of sleeping blindly.
+
+Readiness is a list of explicit conditions checked in order: systemd unit
+states, listening ports, the Katello and Candlepin ping endpoints and the
+server-ping health check. Conditions are polled with an exponential backoff
+that starts over whenever a condition passes, and each condition has its own
+deadline counted from the start of the wait.
+"""
+import json
+import time
+from shlex import quote
+
+from testfm.health import Health
+from testfm.log import logger
+from testfm.profiler import enabled_services
+
+KATELLO_PING_URL = "https://localhost/katello/api/v2/ping"
+CANDLEPIN_PING_URL = "https://localhost:23443/candlepin/status"
+SERVER_PORTS = (443, 9090)
+
+# ansible renders inventory_hostname per host, so each host checks its own units
+UNITS_SCRIPT = 'case "{{{{ inventory_hostname }}}}" in {cases} esac; systemctl is-active $units'
+
+# the enabled units of each host are looked up once, they do not change within a session
+_units = {}
+
+
+class Condition(object):
+    """A readiness condition
+
+    :param str name: name used in log and error messages
+    :param str command: shell command checking the condition on the server
+    :param float deadline: seconds after the start of the wait the condition
+        must pass by
+    :param check: callable(result) telling from the ansible result of command
+        whether the condition passed, defaults to rc 0
+    """
+
+    def __init__(self, name, command, deadline=300, check=None):
+        self.name = name
+        self.command = command
+        self.deadline = deadline
+        self.check = check or (lambda result: result["rc"] == 0)
+
+    def passed(self, ansible_module):
+        """Check the condition on every contacted host"""
+        contacted = ansible_module.shell(self.command)
+        return all(self.check(result) for result in contacted.values())
+
+
+def _json_field(result, field, expected):
+    """Check field of the JSON document command printed"""
+    try:
+        return json.loads(result["stdout"]).get(field) == expected
+    except ValueError:
+        return False
+
+
+def units_in_state(units, state="active", deadline=300):
+    """Condition: every unit of each host reports state in systemctl
+
+    :param dict units: host to its list of units
+    """
+    cases = " ".join(
+        '{}) units="{}";;'.format(quote(host), " ".join(host_units))
+        for host, host_units in sorted(units.items())
+    )
+    return Condition(
+        "units {}".format(state),
+        UNITS_SCRIPT.format(cases=cases),
+        deadline,
+        lambda result: all(line == state for line in result["stdout_lines"]),
+    )
+
+
+def ports_listening(ports=SERVER_PORTS, deadline=300):
+    """Condition: something listens on every TCP port"""
+    return Condition(
+        "ports {}".format(",".join(str(port) for port in ports)),
+        "ss -ltn",
+        deadline,
+        lambda result: all(
+            any(
+                fields[3].endswith(":{}".format(port))
+                for fields in (line.split() for line in result["stdout_lines"][1:])
+                if len(fields) > 3
+            )
+            for port in ports
+        ),
+    )
+
+
+def katello_ping(deadline=300):
+    """Condition: Katello ping reports all backend services ok"""
+    return Condition(
+        "katello ping",
+        "curl -sk {}".format(KATELLO_PING_URL),
+        deadline,
+        lambda result: _json_field(result, "status", "ok"),
+    )
+
+
+def candlepin_ping(deadline=300):
+    """Condition: Candlepin status endpoint answers"""
+    return Condition(
+        "candlepin ping",
+        "curl -sk {}".format(CANDLEPIN_PING_URL),
+        deadline,
+        lambda result: _json_field(result, "result", True),
+    )
+
+
+def server_ping(deadline=600):
+    """Condition: foreman-maintain health check --label server-ping passes"""
+    return Condition(
+        "server-ping", Health.check({"label": "server-ping", "assumeyes": True}), deadline
+    )
+
+
+def server_conditions(ansible_module):
+    """Return the conditions of a fully started Satellite or Capsule"""
+    contacted = ansible_module.command("rpm -q satellite")
+    if any(host not in _units for host in contacted.keys()):
+        _units.update(enabled_services(ansible_module))
+    conditions = [
+        units_in_state({host: _units[host] for host in contacted.keys()}),
+        ports_listening(),
+    ]
+    if all(result["rc"] == 0 for result in contacted.values()):
+        conditions += [candlepin_ping(), katello_ping(), server_ping()]
+    return conditions
+
+
+def wait_for(ansible_module, conditions, initial=0.5, factor=2.0, maximum=10.0):
+    """Poll conditions in order until all passed, return the seconds waited
+
+    The delay between polls grows by factor up to maximum while nothing
+    changes and drops back to initial whenever a condition passes. Fails as
+    soon as the deadline of a pending condition is over.
+    """
+    start = time.monotonic()
+    pending = list(conditions)
+    delay = initial
+    while True:
+        progressed = False
+        while pending and pending[0].passed(ansible_module):
+            logger.info(
+                "{} ready after {:.1f}s".format(pending.pop(0).name, time.monotonic() - start)
+            )
+            progressed = True
+        elapsed = time.monotonic() - start
+        if not pending:
+            return elapsed
+        expired = [condition.name for condition in pending if elapsed >= condition.deadline]
+        assert not expired, "Not ready after {:.0f}s: {}".format(elapsed, ", ".join(expired))
+        if progressed:
+            delay = initial
+        nearest = min(condition.deadline for condition in pending) - elapsed
+        time.sleep(min(delay, nearest))
+        delay = min(delay * factor, maximum)
+
+
+def wait_for_server(ansible_module, **backoff):
+    """Wait until every service, port and ping endpoint of the server is up"""
+    return wait_for(ansible_module, server_conditions(ansible_module), **backoff)
@@ -0,0 +1,287 @@
+# -*- encoding: utf-8 -*-
+"""Runs the suite across a pool of equivalent Satellite and Capsule hosts.
+
+With ``--host-pool`` the controlling pytest process collects the tests, splits
+them between the hosts and starts one pytest worker per host, pointed at its
+host with ``--ansible-host-pattern`` and the ``TESTFM_SERVER_HOSTNAME``
+environment variable. Tests are balanced longest first onto the least loaded
+host, using the durations of previous runs kept in the pytest cache.
+``@capsule`` tests may also go to the ``--capsule-pool`` hosts, every other
+test only runs on a Satellite. Workers stream their reports back, which are
+replayed in the controller, so terminal summary, ``--junitxml`` and exit code
+cover the whole run as if it ran in one process, and ``-x`` or ``--maxfail``
+stop every worker.
+
+Usage::
+
+    pytest --host-pool sat1.example.com,sat2.example.com --capsule-pool cap1.example.com \\
+        --ansible-host-pattern server --ansible-user=root --ansible-inventory testfm/inventory
+
+Every pool host has to be in the inventory.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _pytest.runner import TestReport
+
+from testfm.log import logger
+
+DURATIONS_KEY = "testfm/durations"
+DEFAULT_DURATION = 60.0
+WORKER_ENV = "TESTFM_WORKER"
+HOSTNAME_ENV = "TESTFM_SERVER_HOSTNAME"
+
+# options of the controller the workers must not get, with whether they take a value
+CONTROLLER_OPTIONS = {
+    "--host-pool": True,
+    "--capsule-pool": True,
+    "--ansible-host-pattern": True,
+    "--junitxml": True,
+    "--junit-xml": True,
+    "--worker-tests": True,
+    "--worker-reports": True,
+}
+
+
+def add_host_pool_options(parser):
+    """Add the host pool options to the pytest parser"""
+    group = parser.getgroup("testfm host pool")
+    group.addoption(
+        "--host-pool",
+        default="",
+        help="comma separated Satellite hosts to distribute the tests across",
+    )
+    group.addoption(
+        "--capsule-pool",
+        default="",
+        help="comma separated Capsule hosts @capsule tests may run on",
+    )
+    group.addoption("--worker-tests", default=None, help="internal: tests of a pool worker")
+    group.addoption("--worker-reports", default=None, help="internal: reports of a pool worker")
+
+
+def configure_host_pool(config):
+    """Register the controller or worker plugin the command line asks for"""
+    if config.getoption("worker_tests"):
+        config.pluginmanager.register(HostPoolWorker(config), "testfm-host-pool-worker")
+    elif config.getoption("host_pool"):
+        config.pluginmanager.register(HostPoolController(config), "testfm-host-pool")
+
+
+def _hosts(value):
+    return [host.strip() for host in value.split(",") if host.strip()]
+
+
+def worker_args(args, host, tests, reports):
+    """Return the pytest arguments of the worker of host
+
+    :param list args: command line arguments of the controller
+    """
+    kept = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+            continue
+        name = arg.split("=", 1)[0]
+        if name in CONTROLLER_OPTIONS:
+            skip = CONTROLLER_OPTIONS[name] and "=" not in arg
+            continue
+        kept.append(arg)
+    return kept + [
+        "--ansible-host-pattern",
+        host,
+        "--worker-tests",
+        tests,
+        "--worker-reports",
+        reports,
+    ]
+
+
+def balance(items, durations, hosts, capsules):
+    """Split items between hosts and capsules, longest first onto the least loaded host
+
+    :param dict durations: seconds of previous runs by node id
+    :return: dict of host to its items, in collection order
+    """
+    known = list(durations.values())
+    default = sum(known) / len(known) if known else DEFAULT_DURATION
+    position = {item.nodeid: index for index, item in enumerate(items)}
+    loads = {host: 0.0 for host in hosts + capsules}
+    assigned = {host: [] for host in hosts + capsules}
+    for item in sorted(items, key=lambda item: -durations.get(item.nodeid, default)):
+        candidates = hosts + capsules if item.get_closest_marker("capsule") else hosts
+        host = min(candidates, key=loads.get)
+        loads[host] += durations.get(item.nodeid, default)
+        assigned[host].append(item)
+    for host_items in assigned.values():
+        host_items.sort(key=lambda item: position[item.nodeid])
+    return assigned
+
+
+class HostPoolWorker(object):
+    """Runs the tests the controller gave this worker and writes their reports"""
+
+    def __init__(self, config):
+        with open(config.getoption("worker_tests")) as handle:
+            self.tests = [line.rstrip("\n") for line in handle if line.strip()]
+        self.reports = open(config.getoption("worker_reports"), "a")
+
+    def pytest_collection_modifyitems(self, config, items):
+        by_id = {item.nodeid: item for item in items}
+        tests = set(self.tests)
+        config.hook.pytest_deselected(items=[item for item in items if item.nodeid not in tests])
+        items[:] = [by_id[nodeid] for nodeid in self.tests if nodeid in by_id]
+
+    def pytest_runtest_logreport(self, report):
+        longrepr = report.longrepr
+        if longrepr is not None and not isinstance(longrepr, tuple):
+            longrepr = str(longrepr)
+        record = {
+            "nodeid": report.nodeid,
+            "when": report.when,
+            "outcome": report.outcome,
+            "duration": report.duration,
+            "longrepr": longrepr,
+            "sections": report.sections,
+            "user_properties": list(getattr(report, "user_properties", [])),
+        }
+        if hasattr(report, "wasxfail"):
+            record["wasxfail"] = report.wasxfail
+        self.reports.write("{}\n".format(json.dumps(record, default=str)))
+        self.reports.flush()
+
+    def pytest_unconfigure(self):
+        self.reports.close()
+
+
+class _Worker(object):
+    """A pytest process running the items of one host"""
+
+    def __init__(self, host, items, directory, args):
+        self.host = host
+        self.items = {item.nodeid: item for item in items}
+        self.pending = [item.nodeid for item in items]
+        tests = os.path.join(directory, "{}.tests".format(host))
+        self.reports_path = os.path.join(directory, "{}.reports".format(host))
+        with open(tests, "w") as handle:
+            handle.write("".join("{}\n".format(item.nodeid) for item in items))
+        open(self.reports_path, "w").close()
+        self.log = open(os.path.join(directory, "{}.log".format(host)), "w")
+        env = dict(os.environ, **{HOSTNAME_ENV: host, WORKER_ENV: host})
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "pytest"] + worker_args(args, host, tests, self.reports_path),
+            env=env,
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+        self.reports = open(self.reports_path)
+        self.partial = ""
+
+    def records(self):
+        """Return the reports written since the last call"""
+        self.partial += self.reports.read()
+        lines = self.partial.split("\n")
+        self.partial = lines.pop()
+        return [json.loads(line) for line in lines if line]
+
+    def close(self):
+        self.reports.close()
+        self.log.close()
+
+
+class HostPoolController(object):
+    """Distributes the collected tests over the host pool and replays their reports"""
+
+    def __init__(self, config):
+        self.config = config
+        self.hosts = _hosts(config.getoption("host_pool"))
+        self.capsules = _hosts(config.getoption("capsule_pool"))
+        self.durations = {}
+
+    def _replay(self, worker, record):
+        """Report a worker's test phase as if it ran here"""
+        item = worker.items.get(record["nodeid"])
+        if item is None:
+            return
+        if record["when"] == "setup":
+            item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        longrepr = record["longrepr"]
+        if isinstance(longrepr, list):
+            longrepr = tuple(longrepr)
+        report = TestReport(
+            item.nodeid,
+            item.location,
+            {keyword: 1 for keyword in item.keywords},
+            record["outcome"],
+            longrepr,
+            record["when"],
+            sections=[("host", worker.host)] + [tuple(section) for section in record["sections"]],
+            duration=record["duration"],
+            user_properties=[tuple(prop) for prop in record["user_properties"]],
+        )
+        if "wasxfail" in record:
+            report.wasxfail = record["wasxfail"]
+        item.ihook.pytest_runtest_logreport(report=report)
+        self.durations[item.nodeid] = self.durations.get(item.nodeid, 0) + record["duration"]
+        if record["when"] == "teardown":
+            worker.pending.remove(item.nodeid)
+            item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+    def _fail_pending(self, worker):
+        """Fail the tests a worker exited without running"""
+        message = "pytest worker on {} exited with {} before the test ran, see {}".format(
+            worker.host, worker.process.returncode, worker.log.name
+        )
+        for nodeid in list(worker.pending):
+            for when, outcome in (("setup", "failed"), ("teardown", "passed")):
+                record = {"nodeid": nodeid, "when": when, "outcome": outcome}
+                record.update({"duration": 0, "sections": [], "user_properties": []})
+                record["longrepr"] = message if outcome == "failed" else None
+                self._replay(worker, record)
+
+    def pytest_runtestloop(self, session):
+        if session.config.option.collectonly:
+            return None
+        saved = self.config.cache.get(DURATIONS_KEY, {})
+        directory = str(self.config.cache.makedir("host_pool"))
+        assigned = balance(session.items, saved, self.hosts, self.capsules)
+        workers = [
+            _Worker(host, items, directory, sys.argv[1:])
+            for host, items in assigned.items()
+            if items
+        ]
+        for worker in workers:
+            logger.info("running {} tests on {}".format(len(worker.items), worker.host))
+        start = time.monotonic()
+        running = list(workers)
+        while running:
+            time.sleep(0.5)
+            for worker in list(running):
+                exited = worker.process.poll() is not None
+                for record in worker.records():
+                    self._replay(worker, record)
+                if exited:
+                    if not session.shouldfail:
+                        self._fail_pending(worker)
+                    worker.close()
+                    running.remove(worker)
+            if session.shouldfail:
+                # -x or --maxfail reached, counted by the session from the replayed reports
+                for worker in running:
+                    if worker.process.poll() is None:
+                        worker.process.terminate()
+        logger.info(
+            "host pool of {} hosts ran {} tests in {:.0f}s".format(
+                len(workers), len(session.items), time.monotonic() - start
+            )
+        )
+        saved.update(self.durations)
+        self.config.cache.set(DURATIONS_KEY, saved)
+        timing = self.config.pluginmanager.get_plugin("testfm-timing")
+        if timing is not None:
+            timing.add_workers([worker.host for worker in workers])
+        return True
@@ -19,8 +19,23 @@ Subcommands:
 Options:
     -h, --help                    print help
 """
+import re
+from collections import namedtuple
+from functools import lru_cache
+
 from testfm.base import Base
 
+ServiceState = namedtuple("ServiceState", "state sub enabled pid")
+ServiceState.__doc__ = """State of a unit: active state and sub state as systemctl reports
+them, whether the unit is enabled and its main PID; unknown fields are None"""
+
+# the bullet is "●" under UTF-8 locales and "*" under the C locale
+UNIT_HEADER_RE = re.compile(r"^\s*(?:\u25cf|\*)\s+(\S+)")
+LOADED_RE = re.compile(r"^\s*Loaded:\s+\S+\s+\([^;]*;\s*(\w+)")
+ACTIVE_RE = re.compile(r"^\s*Active:\s+(\S+)(?:\s+\(([^)]*)\))?")
+MAIN_PID_RE = re.compile(r"^\s*Main PID:\s+(\d+)")
+LIST_RE = re.compile(r"^\s*(\S+\.(?:service|socket|timer))\s+(\S+)\s*$")
+
 
 class Service(Base):
     """Manipulates Foreman-maintain's service command"""
@@ -117,3 +132,52 @@ class Service(Base):
         result = cls._construct_command(options)
 
         return result
+
+
+@lru_cache(maxsize=32)
+def parse_service_status(output):
+    """Parse the output of foreman-maintain service status in one pass
+
+    Results are cached per output, so every caller looking at the same
+    invocation shares one parse; do not modify the returned mapping.
+
+    :param str output: stdout of :meth:`Service.service_status`
+    :return: dict of unit name to :data:`ServiceState`
+    """
+    units = {}
+    unit = None
+    for line in output.splitlines():
+        match = UNIT_HEADER_RE.match(line)
+        if match:
+            unit = match.group(1)
+            units[unit] = ServiceState(None, None, None, None)
+            continue
+        if unit is None:
+            continue
+        match = LOADED_RE.match(line)
+        if match:
+            units[unit] = units[unit]._replace(enabled=match.group(1) == "enabled")
+            continue
+        match = ACTIVE_RE.match(line)
+        if match:
+            units[unit] = units[unit]._replace(state=match.group(1), sub=match.group(2))
+            continue
+        match = MAIN_PID_RE.match(line)
+        if match:
+            units[unit] = units[unit]._replace(pid=int(match.group(1)))
+    return units
+
+
+@lru_cache(maxsize=32)
+def parse_service_list(output):
+    """Parse the output of foreman-maintain service list in one pass
+
+    :param str output: stdout of :meth:`Service.service_list`
+    :return: dict of unit name to :data:`ServiceState` with only enabled known
+    """
+    units = {}
+    for line in output.splitlines():
+        match = LIST_RE.match(line)
+        if match:
+            units[match.group(1)] = ServiceState(None, None, match.group(2) == "enabled", None)
+    return units
@@ -0,0 +1,212 @@
+# -*- encoding: utf-8 -*-
+"""Host state declared by tests and the test order that changes it least often.
+
+Tests declare with :func:`testfm.decorators.requires_state` the state of the
+host they need and with :func:`testfm.decorators.leaves_state` the state they
+leave it in, instead of restoring it themselves. Undeclared parts of the state
+are needed in, and left in, their :data:`DEFAULT_STATE`. At collection the tests
+are ordered greedily, always running next the test that is cheapest to reach
+from the state the previous one left, so tests needing stopped services or
+unlocked packages run back to back instead of paying a stop/start or an
+installer run each. :class:`HostState` makes the changes a test needs right
+before it runs and puts the host back into the default state at the end.
+
+Fixtures skip set up steps through :meth:`HostState.step` when a checksum of a
+cheap probe shows the host is still as the step last left it, and skip their
+teardown when the next test uses the same fixture and sets it up again anyway.
+"""
+from testfm.log import logger
+from testfm.maintenance_mode import MaintenanceMode
+from testfm.packages import lock_package_versions
+from testfm.readiness import wait_for_server
+from testfm.service import Service
+
+DEFAULT_STATE = {"services": "running", "maintenance_mode": "off", "packages": "locked"}
+
+# rough seconds a change of each part of the state takes, weighs the ordering
+COSTS = {"services": 120, "maintenance_mode": 30, "packages": 300}
+
+# cheap probes of what fixtures set up, only their checksum leaves the host
+PROBES = {
+    "backups": "ls -d /tmp/backup-* /mnt/satellite-backup-*",
+    "services": "systemctl list-units --type=service --state=running --no-legend | cut -d' ' -f1",
+    "packages": (
+        "rpm -q zsh elinks; cat /etc/yum/pluginconf.d/foreman-protector.conf "
+        "/etc/yum/pluginconf.d/versionlock.list"
+    ),
+}
+PROBE_SCRIPT = 'echo "{name} $( ( {probe} ) 2>&1 | md5sum | cut -c1-32)"'
+
+
+def _command(command):
+    def change(ansible_module):
+        for result in ansible_module.command(command).values():
+            logger.info(result["stdout"])
+            assert result["rc"] == 0
+
+    return change
+
+
+def _start_services(ansible_module):
+    _command(Service.service_start())(ansible_module)
+    wait_for_server(ansible_module)
+
+
+# how to bring each part of the state to each of its values, applied in this order
+TRANSITIONS = (
+    ("services", {"running": _start_services, "stopped": _command(Service.service_stop())}),
+    (
+        "maintenance_mode",
+        {"on": _command(MaintenanceMode.start()), "off": _command(MaintenanceMode.stop())},
+    ),
+    (
+        "packages",
+        {
+            "locked": lock_package_versions,
+            "unlocked": _command("satellite-installer --no-lock-package-versions"),
+        },
+    ),
+)
+
+
+def validate(state):
+    """Fail on parts or values of a declared state that have no transition"""
+    transitions = dict(TRANSITIONS)
+    for key, value in state.items():
+        assert key in transitions, "unknown host state {}".format(key)
+        assert value in transitions[key], "unknown {} state {}".format(key, value)
+    return state
+
+
+def required_state(item):
+    """Return the host state item needs to run"""
+    state = dict(DEFAULT_STATE)
+    marker = item.get_closest_marker("requires_state")
+    if marker is not None:
+        state.update(marker.kwargs)
+    return state
+
+
+def left_state(item):
+    """Return the host state item leaves behind when it passes"""
+    state = required_state(item)
+    marker = item.get_closest_marker("leaves_state")
+    if marker is not None:
+        state.update(marker.kwargs)
+    return state
+
+
+def transition_cost(current, wanted):
+    """Return the rough seconds it takes to change the current state into the wanted one"""
+    return sum(COSTS[key] for key, value in wanted.items() if current.get(key) != value)
+
+
+def ordering_cost(items):
+    """Return the rough seconds of state changes running items in this order takes"""
+    cost = 0
+    current = DEFAULT_STATE
+    for item in items:
+        cost += transition_cost(current, required_state(item))
+        current = left_state(item)
+    return cost + transition_cost(current, DEFAULT_STATE)
+
+
+def order_by_state(items):
+    """Reorder items in place, greedily running the cheapest to reach test next
+
+    Of tests as cheap to reach, the one changing the state least itself runs
+    first, so tests sharing a required state run before the one leaving it.
+    Remaining ties keep the collection order, so tests without declared state
+    keep their order and a run where no test declares state is not reordered.
+    """
+    before = ordering_cost(items)
+    current = DEFAULT_STATE
+    remaining = list(items)
+    ordered = []
+    while remaining:
+        costs = [
+            (
+                transition_cost(current, required_state(item)),
+                transition_cost(required_state(item), left_state(item)),
+            )
+            for item in remaining
+        ]
+        item = remaining.pop(costs.index(min(costs)))
+        ordered.append(item)
+        current = left_state(item)
+    items[:] = ordered
+    after = ordering_cost(items)
+    if after != before:
+        logger.info(
+            "ordered tests by host state: about {}s of state changes instead of {}s".format(
+                after, before
+            )
+        )
+
+
+def next_test_uses(item, fixture):
+    """Whether the test running after item uses fixture, and is not possibly skipped
+    before setting it up"""
+    nextitem = getattr(item, "nextitem", None)
+    if nextitem is None or fixture not in nextitem.fixturenames:
+        return False
+    return not any(nextitem.get_closest_marker(name) for name in ("skip", "skipif", "stubbed"))
+
+
+class HostState(object):
+    """The state the host was last seen or left in, changed only where a test needs it
+
+    A part of the state a failed test should have left behind is unknown and is
+    changed again before the next test needing it.
+    """
+
+    def __init__(self):
+        self.known = dict(DEFAULT_STATE)
+        self.verified = {}
+        self._ansible_module = None
+
+    def checksums(self, ansible_module, names):
+        """Return dict of each probe name to the checksums of its output on every host"""
+        script = "; ".join(PROBE_SCRIPT.format(name=name, probe=PROBES[name]) for name in names)
+        checksums = {}
+        for host, result in sorted(ansible_module.shell(script).items()):
+            assert result["rc"] == 0, result["stderr"]
+            for line in result["stdout"].splitlines():
+                name, checksum = line.split()
+                checksums[name] = "{} {}:{}".format(checksums.get(name, ""), host, checksum)
+        return checksums
+
+    def step(self, ansible_module, name, function):
+        """Call function, which sets up what probe name looks at, unless the probe
+        shows the host is still as function last left it
+
+        :return: whether function was called
+        """
+        if name in self.verified:
+            if self.checksums(ansible_module, [name])[name] == self.verified[name]:
+                logger.info("host {} unchanged, skipping {}".format(name, function.__name__))
+                return False
+        function()
+        self.verified[name] = self.checksums(ansible_module, [name])[name]
+        return True
+
+    def require(self, ansible_module, state):
+        """Change the parts of the host state that differ from state"""
+        self._ansible_module = ansible_module
+        for key, transitions in TRANSITIONS:
+            if key in state and self.known.get(key) != state[key]:
+                logger.info("changing host {} to {}".format(key, state[key]))
+                self.known[key] = None
+                transitions[state[key]](ansible_module)
+                self.known[key] = state[key]
+
+    def leave(self, state, passed=True):
+        """Record the state a test left the host in"""
+        for key, value in state.items():
+            if self.known.get(key) != value:
+                self.known[key] = value if passed else None
+
+    def restore(self):
+        """Put the host back into the default state"""
+        if self._ansible_module is not None:
+            self.require(self._ansible_module, DEFAULT_STATE)
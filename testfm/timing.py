@@ -0,0 +1,293 @@
+# -*- encoding: utf-8 -*-
+"""Where the time of a test session goes: tests, fixtures and remote commands.
+
+With ``--timings PATH`` or ``--timeline PATH`` every ``ansible_module`` call, every
+:func:`testfm.helpers.run` and the set up and teardown of every ``conftest.py``
+fixture is recorded as a :data:`Span` of :func:`time.monotonic` timestamps,
+named after the command line the ``Base`` builders made. At the end of the
+session a per-test breakdown is written to the ``--timings`` PATH as JSON, the
+``--timings-top`` slowest commands are printed and the spans are exported to the
+``--timeline`` PATH as a timeline, see :mod:`testfm.trace`. Recording a span is a
+couple of clock reads and a list append, negligible next to a remote command.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+import pytest
+
+from testfm.constants import SERVER_HOSTNAME
+from testfm.log import logger
+from testfm.trace import read_trace
+from testfm.trace import trace_events
+from testfm.trace import write_trace
+
+Span = namedtuple("Span", "kind name start end test hosts")
+Span.__doc__ = """What ran from start to end during test, kind is 'test', 'setup', 'call',
+'teardown', 'fixture setup', 'fixture teardown', 'command' or a foreman-maintain
+'phase' or 'step', hosts the hosts it ran on"""
+
+PHASES = ("test", "setup", "call", "teardown")
+
+NAME_LIMIT = 200
+
+
+def command_name(module, args, kwargs):
+    """Return the command line of an ansible module call"""
+    words = [module] + [str(arg) for arg in args]
+    words += ["{}={}".format(key, value) for key, value in sorted(kwargs.items())]
+    name = " ".join(words)
+    return name if len(name) <= NAME_LIMIT else name[: NAME_LIMIT - 3] + "..."
+
+
+class TimingRecorder(object):
+    """Collects the spans of the session, while enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.clock_offset = time.time() - time.monotonic()
+        self.spans = []
+        self.test = None
+
+    def record(self, kind, name, start, end, hosts=()):
+        """Record a span of the current test"""
+        if self.enabled:
+            self.spans.append(Span(kind, name, start, end, self.test, tuple(hosts)))
+
+    def record_remote(self, kind, name, start, end, host, origin):
+        """Record a span timed by the clock of host, in seconds since the epoch
+
+        The clocks of host and controller differ, so the span is anchored to the
+        start of the last command recorded on host, which started at origin by
+        the clock of host, and clamped to that command.
+        """
+        commands = [span for span in self.spans if span.kind == "command" and host in span.hosts]
+        if not commands:
+            return
+        command = commands[-1]
+
+        def local(timestamp):
+            return min(max(command.start + timestamp - origin, command.start), command.end)
+
+        self.record(kind, name, local(start), local(end), [host])
+
+
+recorder = TimingRecorder()
+
+
+class TimedModule(object):
+    """Times every module call of the ansible_module it stands in for"""
+
+    def __init__(self, ansible_module):
+        self._ansible_module = ansible_module
+
+    def __getattr__(self, name):
+        attribute = getattr(self._ansible_module, name)
+        if not callable(attribute):
+            return attribute
+
+        def timed(*args, **kwargs):
+            start = time.monotonic()
+            result = None
+            try:
+                result = attribute(*args, **kwargs)
+                return result
+            finally:
+                # a call that raised ran on hosts unknown here
+                hosts = sorted(result.keys()) if hasattr(result, "keys") else ()
+                recorder.record(
+                    "command", command_name(name, args, kwargs), start, time.monotonic(), hosts
+                )
+
+        return timed
+
+
+def timed_module(ansible_module):
+    """Return ansible_module, timed when timings are recorded"""
+    return TimedModule(ansible_module) if recorder.enabled else ansible_module
+
+
+def add_timing_options(parser):
+    """Add the timing options to the pytest parser"""
+    group = parser.getgroup("testfm timings")
+    group.addoption(
+        "--timings",
+        default=None,
+        metavar="PATH",
+        help="record tests, fixtures and remote commands and write their timings to PATH",
+    )
+    group.addoption(
+        "--timeline",
+        default=None,
+        metavar="PATH",
+        help="export tests, fixtures and remote commands as a Chrome trace to PATH",
+    )
+    group.addoption(
+        "--timings-top",
+        type=int,
+        default=10,
+        help="number of slowest commands printed with --timings",
+    )
+
+
+def worker_path(path, worker):
+    """Return the path the pytest worker of a host pool writes path to"""
+    if path is None or worker is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return "{}-{}{}".format(root, worker, extension)
+
+
+def configure_timing(config):
+    """Register the timing plugin when --timings or --timeline ask for it"""
+    worker = os.environ.get("TESTFM_WORKER")
+    path = worker_path(config.getoption("timings"), worker)
+    trace = worker_path(config.getoption("timeline"), worker)
+    if path or trace:
+        plugin = TimingPlugin(path, config.getoption("timings_top"), trace, worker)
+        config.pluginmanager.register(plugin, "testfm-timing")
+
+
+def breakdown(spans):
+    """Return dict of test to its total, setup, call, teardown, fixture and command seconds"""
+    tests = {}
+    for span in spans:
+        if span.test is None:
+            continue
+        test = tests.setdefault(span.test, {"fixtures": {}, "commands": 0.0, "command_count": 0})
+        seconds = span.end - span.start
+        if span.kind == "command":
+            test["commands"] += seconds
+            test["command_count"] += 1
+        elif span.kind.startswith("fixture "):
+            phases = test["fixtures"].setdefault(span.name, {})
+            phase = span.kind.split(" ", 1)[1]
+            phases[phase] = phases.get(phase, 0.0) + seconds
+        elif span.kind in PHASES:
+            kind = "total" if span.kind == "test" else span.kind
+            test[kind] = test.get(kind, 0.0) + seconds
+    return tests
+
+
+def slowest_commands(spans, top):
+    """Return the top slowest commands of spans, as JSON serializable dicts"""
+    commands = [span for span in spans if span.kind == "command"]
+    return [
+        {
+            "command": span.name,
+            "seconds": span.end - span.start,
+            "test": span.test,
+            "hosts": span.hosts,
+        }
+        for span in sorted(commands, key=lambda span: span.start - span.end)[:top]
+    ]
+
+
+class TimingPlugin(object):
+    """Records the spans of the session and reports them at its end
+
+    A controller of a host pool adds its workers with :meth:`add_workers` and
+    merges their reports into its own.
+    """
+
+    def __init__(self, path, top, trace=None, worker=None):
+        self.path = path
+        self.top = top
+        self.trace = trace
+        self.worker = worker
+        self.workers = []
+        self.slowest = []
+        recorder.enabled = True
+
+    def add_workers(self, workers):
+        """Merge the reports of the pytest workers of these hosts"""
+        self.workers.extend(workers)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item):
+        recorder.test = item.nodeid
+        start = time.monotonic()
+        yield
+        recorder.record("test", item.nodeid, start, time.monotonic())
+        # what runs between tests, like session fixture teardown, belongs to none
+        recorder.test = None
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        start = time.monotonic()
+        yield
+        recorder.record("setup", "setup", start, time.monotonic())
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        start = time.monotonic()
+        yield
+        recorder.record("call", "call", start, time.monotonic())
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        start = time.monotonic()
+        yield
+        recorder.record("teardown", "teardown", start, time.monotonic())
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        start = time.monotonic()
+        yield
+        if "conftest" not in getattr(fixturedef.func, "__module__", ""):
+            return
+        recorder.record("fixture setup", fixturedef.argname, start, time.monotonic())
+
+        def teardown_started():
+            fixturedef.testfm_teardown_start = time.monotonic()
+            if fixturedef.scope != "function":
+                # torn down with whichever test ran last, it belongs to none of them
+                fixturedef.testfm_test = recorder.test
+                recorder.test = None
+
+        # finalizers run last in first out, this one right before the fixture's own
+        fixturedef.addfinalizer(teardown_started)
+
+    def pytest_fixture_post_finalizer(self, fixturedef):
+        start = getattr(fixturedef, "testfm_teardown_start", None)
+        if start is not None:
+            fixturedef.testfm_teardown_start = None
+            recorder.record("fixture teardown", fixturedef.argname, start, time.monotonic())
+            if fixturedef.scope != "function":
+                recorder.test = fixturedef.testfm_test
+
+    def pytest_sessionfinish(self):
+        tests = breakdown(recorder.spans)
+        self.slowest = slowest_commands(recorder.spans, self.top)
+        if self.path:
+            for worker in self.workers:
+                path = worker_path(self.path, worker)
+                if os.path.exists(path):
+                    with open(path) as handle:
+                        timings = json.load(handle)
+                    tests.update(timings["tests"])
+                    self.slowest += timings["slowest_commands"]
+            self.slowest.sort(key=lambda command: -command["seconds"])
+            self.slowest = self.slowest[: self.top]
+            with open(self.path, "w") as handle:
+                json.dump({"tests": tests, "slowest_commands": self.slowest}, handle, indent=2)
+            logger.info("timings of {} tests written to {}".format(len(tests), self.path))
+        if self.trace:
+            process = "worker {}".format(self.worker) if self.worker else "testfm"
+            events = trace_events(recorder.spans, recorder.clock_offset, process, SERVER_HOSTNAME)
+            for worker in self.workers:
+                events += read_trace(worker_path(self.trace, worker))
+            write_trace(self.trace, events)
+            logger.info("trace of {} events written to {}".format(len(events), self.trace))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.slowest:
+            return
+        terminalreporter.write_sep("=", "{} slowest commands".format(len(self.slowest)))
+        for command in self.slowest:
+            terminalreporter.write_line(
+                "{:8.2f}s {} ({})".format(
+                    command["seconds"], command["command"], command["test"] or "session"
+                )
+            )
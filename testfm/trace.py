@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+"""Export of the session timings as a Chrome Trace Event timeline.
+
+The spans of :mod:`testfm.timing` become complete ("X") events of one process
+per pytest worker and one thread per host, so a run opened in Perfetto or
+``chrome://tracing`` shows each host as a track with tests, their phases,
+fixtures, remote commands and the foreman-maintain phases and steps timed on
+the server nested below each other, and shows idle gaps and what overlapped.
+Timestamps are microseconds since the epoch, so traces of the workers of a
+host pool line up when merged.
+"""
+import json
+import os
+
+# spans of pytest itself rather than of a host
+WORKER_KINDS = ("test", "setup", "call", "teardown", "fixture setup", "fixture teardown")
+
+
+def trace_events(spans, clock_offset, process, host, pid=None):
+    """Return the trace events of spans
+
+    :param float clock_offset: seconds to add to a monotonic timestamp to get
+        the time since the epoch
+    :param str process: name of the process track, like the worker
+    :param str host: host tests and fixtures running no command are drawn on
+    """
+    pid = os.getpid() if pid is None else pid
+    tids = {}
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process}}]
+
+    def tid(name):
+        if name not in tids:
+            tids[name] = len(tids) + 1
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tids[name],
+                    "args": {"name": name},
+                }
+            )
+        return tids[name]
+
+    # tests and their fixtures are drawn on the tracks of the hosts their commands ran on
+    test_hosts = {}
+    for span in spans:
+        if span.kind == "command":
+            test_hosts.setdefault(span.test, set()).update(span.hosts)
+    for span in spans:
+        if span.kind in WORKER_KINDS:
+            hosts = sorted(test_hosts.get(span.test) or [host])
+        else:
+            hosts = span.hosts or [host]
+        name = span.test if span.kind == "test" else span.name
+        # rounding the end rather than the duration keeps nested spans within their parent
+        start = round((span.start + clock_offset) * 1e6)
+        end = round((span.end + clock_offset) * 1e6)
+        for span_host in hosts:
+            events.append(
+                {
+                    "name": name,
+                    "cat": span.kind,
+                    "ph": "X",
+                    "ts": start,
+                    "dur": end - start,
+                    "pid": pid,
+                    "tid": tid(span_host),
+                    "args": {"test": span.test},
+                }
+            )
+    return events
+
+
+def write_trace(path, events):
+    """Write trace events to path in the JSON object format"""
+    with open(path, "w") as handle:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+
+
+def read_trace(path):
+    """Return the trace events of a trace file, none if it does not exist"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as handle:
+        return json.load(handle)["traceEvents"]
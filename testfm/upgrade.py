@@ -16,8 +16,102 @@ Subcommands:
 Options:
     -h, --help                    print help
 """
+import re
+from collections import namedtuple
+
 from testfm.base import Base
 
+STEP_STATUSES = ("OK", "FAIL", "WARNING", "SKIPPED", "ABORTED")
+STEP_RE = re.compile(r"^(?P<name>.*?):?\s*\[(?P<status>{})\]$".format("|".join(STEP_STATUSES)))
+ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+# 'Checks before upgrading to Satellite 6.8' -> 'Checks before upgrading'
+PHASE_TARGET_RE = re.compile(r" (to|from) (Satellite|Capsule)\b.*$")
+
+
+class UpgradeStep(namedtuple("UpgradeStep", "name status start end")):
+    """A step of an upgrade phase with its status and the timestamps it started
+    and ended at, None when the output was not timestamped
+    """
+
+    @property
+    def duration(self):
+        """Seconds the step took, None if unknown"""
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+
+class UpgradePhase(namedtuple("UpgradePhase", "name start end steps")):
+    """A phase of an upgrade like the pre-upgrade checks, with its steps"""
+
+    @property
+    def duration(self):
+        """Seconds the phase took, None if unknown"""
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    @property
+    def key(self):
+        """Name of the phase without the target version, to compare across versions"""
+        return PHASE_TARGET_RE.sub("", self.name)
+
+
+class UpgradeCheck(namedtuple("UpgradeCheck", "version rc duration output phases")):
+    """Result of upgrade check to one target version: return code, seconds it
+    took, output lines and parsed phases
+    """
+
+    @property
+    def failed(self):
+        """Names of the steps that failed"""
+        return self._steps("FAIL")
+
+    @property
+    def warnings(self):
+        """Names of the steps that ended with a warning"""
+        return self._steps("WARNING")
+
+    def _steps(self, status):
+        return [
+            step.name for phase in self.phases for step in phase.steps if step.status == status
+        ]
+
+
+def parse_upgrade_output(lines):
+    """Split the output of upgrade check or run into phases and steps
+
+    A phase starts at a 'Running ...' line underlined with '=', a step ends at a
+    line ending in its status like '[OK]' and starts where the previous step
+    of the phase ended.
+
+    :param lines: iterable of (timestamp, line), timestamp may be None
+    :return: list of :class:`UpgradePhase`
+    """
+    phases = []
+    previous = (None, "")
+    last = None
+    for timestamp, line in lines:
+        # a terminal ends lines in \r\n, a \r within a line redraws it
+        line = ANSI_RE.sub("", line).rstrip("\r").rsplit("\r", 1)[-1].strip()
+        if line.startswith("====") and previous[1].startswith("Running "):
+            if phases:
+                phases[-1] = phases[-1]._replace(end=previous[0])
+            name = previous[1].split("Running ", 1)[1]
+            phases.append(UpgradePhase(name, previous[0], None, []))
+            last = previous[0]
+        elif phases:
+            match = STEP_RE.match(line)
+            if match:
+                phases[-1].steps.append(
+                    UpgradeStep(match.group("name"), match.group("status"), last, timestamp)
+                )
+                last = timestamp
+        previous = (timestamp, line)
+    if phases:
+        phases[-1] = phases[-1]._replace(end=previous[0])
+    return phases
+
 
 class Upgrade(Base):
     """Manipulates Foreman-maintain's health command"""
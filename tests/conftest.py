@@ -1,28 +1,88 @@
-import datetime
+from contextlib import ExitStack
 
 import pytest
-import yaml
 from fauxfactory import gen_string
 
 from testfm.advanced import Advanced
+from testfm.backup_pool import BackupPool
 from testfm.constants import DOGFOOD_ACTIVATIONKEY
 from testfm.constants import DOGFOOD_ORG
 from testfm.constants import epel_repo
 from testfm.constants import fm_hammer_yml
 from testfm.constants import foreman_maintain_yml
-from testfm.constants import HOTFIX_URL
 from testfm.constants import katello_ca_consumer
 from testfm.constants import RHN_PASSWORD
 from testfm.constants import RHN_POOLID
 from testfm.constants import RHN_USERNAME
 from testfm.constants import satellite_answer_file
 from testfm.constants import upstream_url
+from testfm.foreman_api import ForemanAPI
+from testfm.foreman_tasks import remove_seeded_tasks
+from testfm.foreman_tasks import seed_tasks
+from testfm.hammer import Hammer
 from testfm.helpers import product
 from testfm.helpers import run
+from testfm.local_repo import LocalRepoServer
 from testfm.log import logger
 from testfm.maintenance_mode import MaintenanceMode
+from testfm.packages import lock_package_versions
 from testfm.packages import Packages
+from testfm.packages import packages_unlocked
+from testfm.pipeline import RoundTrip
+from testfm.pipeline import STAGES
+from testfm.profiler import check_matrix
+from testfm.provision import Provisioner
+from testfm.readiness import wait_for_server
+from testfm.scheduler import add_host_pool_options
+from testfm.scheduler import configure_host_pool
 from testfm.service import Service
+from testfm.state import HostState
+from testfm.state import left_state
+from testfm.state import next_test_uses
+from testfm.state import order_by_state
+from testfm.state import required_state
+from testfm.state import transition_cost
+from testfm.timing import add_timing_options
+from testfm.timing import configure_timing
+from testfm.timing import timed_module
+
+
+def pytest_addoption(parser):
+    add_host_pool_options(parser)
+    add_timing_options(parser)
+    parser.addoption(
+        "--run-scale",
+        action="store_true",
+        default=False,
+        help="run the @scale tests, which take hours on their largest sizes",
+    )
+
+
+def pytest_configure(config):
+    configure_host_pool(config)
+    configure_timing(config)
+
+
+def pytest_collection_modifyitems(config, items):
+    if not config.getoption("run_scale"):
+        skip_scale = pytest.mark.skip(reason="scale test, run with --run-scale")
+        for item in items:
+            if item.get_closest_marker("scale"):
+                item.add_marker(skip_scale)
+    order_by_state(items)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_protocol(item, nextitem):
+    # fixtures look ahead to skip a teardown the next test sets up again anyway
+    item.nextitem = nextitem
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    setattr(item, "rep_" + report.when, report)
 
 
 @pytest.fixture(scope="function")
@@ -44,7 +104,7 @@ def setup_yum_exclude(request, ansible_module):
 
 
 @pytest.fixture(scope="function")
-def setup_hotfix_check(request, ansible_module):
+def setup_hotfix_check(request, local_repos, ansible_module):
     """This fixture is used for installing hofix package and modifying foreman file.
     This fixture is used in test_positive_check_hotfix_installed_with_hotfix of test_health.py
     """
@@ -61,47 +121,34 @@ def setup_hotfix_check(request, ansible_module):
         name="hotfix_repo",
         description="hotfix_repo",
         file="hotfix_repo",
-        baseurl=HOTFIX_URL,
+        baseurl=local_repos.start(ansible_module).url("hotfix"),
         enabled="yes",
         gpgcheck="no",
     )
     setup = ansible_module.file(path="/etc/yum.repos.d/hotfix_repo.repo", state="present")
     assert setup.values()[0]["changed"] == 0
-    if float(product()) >= 6.6:
-        pkgs_locked = ansible_module.command(Packages.is_locked()).values()[0]["rc"]
-        if pkgs_locked == 0:
-            ansible_module.command(Packages.unlock())
-        setup = ansible_module.yum(name="hotfix-package", state="present")
-        for result in setup.values():
-            assert result["rc"] == 0
-        if pkgs_locked == 0:
-            ansible_module.command(Packages.lock())
+    # packages are unlocked around the yum commands only, the test runs with them locked
+    lockable = float(product()) >= 6.6
+    if lockable:
+        with packages_unlocked(ansible_module):
+            setup = ansible_module.yum(name="hotfix-package", state="present")
+            for result in setup.values():
+                assert result["rc"] == 0
 
     def teardown_hotfix_check():
-        if float(product()) >= 6.6:
-            teardown = ansible_module.command(Packages.unlock())
+        with ExitStack() as stack:
+            if lockable:
+                stack.enter_context(packages_unlocked(ansible_module))
+            teardown = ansible_module.command("yum -y reinstall tfm-rubygem-fog-vsphere")
             for result in teardown.values():
-                logger.info(result["stdout"])
-                assert "FAIL" not in result["stdout"]
                 assert result["rc"] == 0
-        if pkgs_locked == 0:
-            ansible_module.command(Packages.unlock())
-        teardown = ansible_module.command("yum -y reinstall tfm-rubygem-fog-vsphere")
-        for result in teardown.values():
-            assert result["rc"] == 0
-        if float(product()) >= 6.6:
-            teardown = ansible_module.command(Packages.lock())
+            teardown = ansible_module.file(
+                path="/etc/yum.repos.d/hotfix_repo.repo", state="absent"
+            )
+            assert teardown.values()[0]["changed"] == 1
+            teardown = ansible_module.yum(name=["hotfix-package"], state="absent")
             for result in teardown.values():
-                logger.info(result["stdout"])
-                assert "FAIL" not in result["stdout"]
                 assert result["rc"] == 0
-        teardown = ansible_module.file(path="/etc/yum.repos.d/hotfix_repo.repo", state="absent")
-        assert teardown.values()[0]["changed"] == 1
-        teardown = ansible_module.yum(name=["hotfix-package"], state="absent")
-        for result in teardown.values():
-            assert result["rc"] == 0
-        if pkgs_locked == 0:
-            ansible_module.command(Packages.lock())
         ansible_module.command("yum clean all")
 
     request.addfinalizer(teardown_hotfix_check)
@@ -117,30 +164,23 @@ def setup_install_pkgs(ansible_module):
     setup = ansible_module.yum(name="fio", state="present")
     for result in setup.values():
         assert result["rc"] == 0
-    setup = ansible_module.command(Packages.unlock())
-    for result in setup.values():
-        assert result["rc"] == 0
-    setup = ansible_module.yum(name=["python-kitchen", "yum-utils"], state="present")
-    for result in setup.values():
-        assert result["rc"] == 0
-    teardown = ansible_module.command(Packages.lock())
-    for result in teardown.values():
-        assert result["rc"] == 0
+    with packages_unlocked(ansible_module):
+        setup = ansible_module.yum(name=["python-kitchen", "yum-utils"], state="present")
+        for result in setup.values():
+            assert result["rc"] == 0
 
 
 @pytest.fixture(scope="function")
-def setup_for_hammer_defaults(request, ansible_module):
+def setup_for_hammer_defaults(request, hammer):
     """This fixture is used to add/delete hammer defaults value.
     It is used by test test_positive_sync_plan_with_hammer_defaults of test_advanced.py.
     """
-    setup = ansible_module.command(
-        "hammer defaults add --param-name organization_id --param-value 1"
-    )
-    assert setup.values()[0]["rc"] == 0
+    setup = hammer.run("defaults add --param-name organization_id --param-value 1")
+    assert setup.rc == 0, setup.stdout
 
     def teardown_for_hammer_defaults():
-        teardown = ansible_module.command("hammer defaults delete --param-name organization_id")
-        assert teardown.values()[0]["rc"] == 0
+        teardown = hammer.run("defaults delete --param-name organization_id")
+        assert teardown.rc == 0, teardown.stdout
 
     request.addfinalizer(teardown_for_hammer_defaults)
 
@@ -159,81 +199,44 @@ def setup_katello_service_stop(request, ansible_module):
         for result in teardown.values():
             logger.info(result["stdout"])
             assert result["rc"] == 0
+        wait_for_server(ansible_module)
 
     request.addfinalizer(teardown_katello_service_start)
 
 
 @pytest.fixture(scope="function")
-def setup_install_pexpect(ansible_module):
-    """This fixture is used to install pexpect on host.
+def setup_install_pexpect(provisioner, ansible_module):
+    """This fixture is used to install pexpect on host, once per session.
     It is used by test test_positive_foreman_maintain_hammer_setup,
     test_positive_foreman_tasks_ui_investigate,
     test_positive_check_old_foreman_tasks of test_advanced.py and in
     fixture setup_puppet_empty_cert.
     """
-    ansible_module.get_url(url="https://bootstrap.pypa.io/get-pip.py", dest="/root")
-    setup = ansible_module.command("python /root/get-pip.py")
-    for result in setup.values():
-        assert result["rc"] == 0
-    setup = ansible_module.command("pip install pexpect")
-    for result in setup.values():
-        assert result["rc"] == 0
+    provisioner.ensure(ansible_module, "pexpect")
 
 
 @pytest.fixture(scope="function")
-def setup_sync_plan(request, ansible_module):
+def setup_sync_plan(request, foreman_api, ansible_module):
     """This fixture is used to create/delete sync-plan.
     It is used by tests test_positive_sync_plan_disable_enable and test_positive_maintenance_mode.
     """
     sync_plan_name = gen_string("alpha")
+    created = []
     ansible_module.lineinfile(
         dest=foreman_maintain_yml, insertafter="EOF", line=":manage_crond: true"
     )
 
     def sync_plan():
-        org_ids = []
-        sync_ids = []
-        sat_hostname = ""
-        sync_date = datetime.datetime.today().strftime("%Y-%m-%d")
-        setup = ansible_module.command(
-            'hammer sync-plan create --name {} --enabled true \
-            --interval "weekly" --sync-date {} --organization-id 1'.format(
-                sync_plan_name, sync_date
-            )
-        )
-        for result in setup.values():
-            assert result["rc"] == 0
-        # Find all sync-plan id present in satellite
-        for facts in ansible_module.setup().items():
-            sat_hostname = facts[0]
-        setup = ansible_module.shell("hammer --output json organization list > /tmp/orgs.yaml")
-        ansible_module.fetch(src="/tmp/orgs.yaml", dest="./")
-        with open("./{}/tmp/orgs.yaml".format(sat_hostname)) as f:
-            org_yml = yaml.safe_load(f)
-        for id in org_yml:
-            org_ids.append(id["Id"])
-        for id in org_ids:
-            ansible_module.shell(
-                "hammer --output yaml sync-plan list --organization-id {} | "
-                "sed -n '1!p' >> /tmp/sync_id.yaml".format(id)
-            )
-        ansible_module.fetch(src="/tmp/sync_id.yaml", dest="./")
-        with open("./{}/tmp/sync_id.yaml".format(sat_hostname)) as f:
-            sync_yml = yaml.safe_load(f)
-            for id in sync_yml:
-                if id["Enabled"]:
-                    sync_ids.append(id["ID"])
+        created.extend(foreman_api.create_sync_plans(1, [sync_plan_name]))
         request.addfinalizer(teardown_sync_plan)
-        return list(set(sync_ids)), sat_hostname
+        # Find all sync-plan id present in satellite
+        return foreman_api.enabled_sync_plan_ids()
 
     def teardown_sync_plan():
         teardown = ansible_module.command(MaintenanceMode.stop())
         for result in teardown.values():
             assert result["rc"] == 0
-        for path in ["/tmp/sync_id.yaml", "/tmp/orgs.yaml"]:
-            ansible_module.file(
-                path=path, state="absent",
-            )
+        foreman_api.delete_sync_plans(1, created)
         ansible_module.lineinfile(
             dest=foreman_maintain_yml, state="absent", line=":manage_crond: true"
         )
@@ -241,6 +244,53 @@ def setup_sync_plan(request, ansible_module):
     return sync_plan
 
 
+@pytest.fixture(scope="function")
+def setup_sync_plans(request, foreman_api, ansible_module):
+    """This fixture is used to create active sync-plans in bulk and delete them afterwards.
+    It is used by tests test_positive_maintenance_mode_transition_timing and
+    test_positive_sync_plans_disable_enable_throughput.
+    """
+    prefix = "testfm-{}".format(gen_string("alpha"))
+    created = {}
+    organizations = []
+    ansible_module.lineinfile(
+        dest=foreman_maintain_yml, insertafter="EOF", line=":manage_crond: true"
+    )
+
+    def sync_plans(count, new_organizations=0):
+        """Create count sync plans, spread over new_organizations new organizations
+        or in the default organization, return the number created so far.
+        """
+        org_ids = [1]
+        if new_organizations:
+            names = [
+                "{}-org-{}".format(prefix, len(organizations) + index)
+                for index in range(new_organizations)
+            ]
+            org_ids = foreman_api.create_organizations(names)
+            organizations.extend(org_ids)
+        for index, org_id in enumerate(org_ids):
+            share = count // len(org_ids) + (1 if index < count % len(org_ids) else 0)
+            total = sum(len(ids) for ids in created.values())
+            names = ["{}-{}".format(prefix, total + number) for number in range(share)]
+            created.setdefault(org_id, []).extend(foreman_api.create_sync_plans(org_id, names))
+        return sum(len(ids) for ids in created.values())
+
+    def teardown_sync_plans():
+        teardown = ansible_module.command(MaintenanceMode.stop())
+        for result in teardown.values():
+            assert result["rc"] == 0
+        for org_id, ids in created.items():
+            foreman_api.delete_sync_plans(org_id, ids)
+        foreman_api.delete_organizations(organizations)
+        ansible_module.lineinfile(
+            dest=foreman_maintain_yml, state="absent", line=":manage_crond: true"
+        )
+
+    request.addfinalizer(teardown_sync_plans)
+    return sync_plans
+
+
 @pytest.fixture(scope="function")
 def setup_puppet_empty_cert(setup_install_pexpect, ansible_module):
     """This fixture is used to create empty puppet cert and also uses
@@ -256,18 +306,20 @@ def setup_puppet_empty_cert(setup_install_pexpect, ansible_module):
 
 
 @pytest.fixture(scope="function")
-def setup_upstream_repository(request, ansible_module):
+def setup_upstream_repository(request, local_repos, ansible_module):
     """This fixture is used to create/delete upstream repositories.
     It is used by test test_positive_check_upstream_repository of test_health.py.
     """
+    local_repos.start(ansible_module)
     for name, url in upstream_url.items():
         ansible_module.yum_repository(
             name=name,
             description=name,
             file="upstream_repo",
-            baseurl=url,
+            baseurl=local_repos.mirror(url),
             enabled="yes",
-            gpgcheck="no",
+            gpgcheck="yes",
+            gpgkey=local_repos.gpg_key_url,
         )
     setup = ansible_module.file(path="/etc/yum.repos.d/upstream_repo.repo", state="present")
     assert setup.values()[0]["changed"] == 0
@@ -331,8 +383,9 @@ def setup_subscribe_to_cdn_dogfood(request, ansible_module):
 
 
 @pytest.fixture(scope="function")
-def setup_epel_repository(request, ansible_module):
-    setup = ansible_module.yum(name=epel_repo, state="present")
+def setup_epel_repository(request, local_repos, ansible_module):
+    local_repos.start(ansible_module)
+    setup = ansible_module.yum(name=local_repos.mirror(epel_repo), state="present")
     assert setup.values()[0]["rc"] == 0
 
     def teardown_epel_repository():
@@ -393,18 +446,18 @@ def setup_bz_1696862(request, ansible_module):
 
 
 @pytest.fixture(scope="function")
-def setup_hammer_defaults(request, ansible_module):
+def setup_hammer_defaults(request, hammer):
     """ This fixture is used by test test_positive_automate_bz1632768
     for setup/teardown.
     """
-    ansible_module.command("hammer defaults add --param-name organization_id --param-value 1")
-    setup = ansible_module.command("hammer defaults list")
-    assert "organization_id" in setup.values()[0]["stdout"]
+    hammer.run("defaults add --param-name organization_id --param-value 1")
+    setup = hammer.run("defaults list")
+    assert "organization_id" in setup.stdout
 
     def teardown_hammer_defaults():
-        ansible_module.command("hammer defaults delete --param-name organization_id")
-        teardown = ansible_module.command("hammer defaults list")
-        assert "organization_id" not in teardown.values()[0]["stdout"]
+        hammer.run("defaults delete --param-name organization_id")
+        teardown = hammer.run("defaults list")
+        assert "organization_id" not in teardown.stdout
 
     request.addfinalizer(teardown_hammer_defaults)
 
@@ -419,58 +472,233 @@ def setup_old_foreman_tasks(ansible_module):
 
 
 @pytest.fixture(scope="function")
-def setup_backup_tests(request, ansible_module):
-    """ Teardown for backup/restore tests."""
-    setup = ansible_module.shell("rm -rf /tmp/backup-*; rm -rf /mnt/satellite-backup-*")
-    assert setup.values()[0]["rc"] == 0
-    ansible_module.command(Service.service_start())
+def setup_seeded_tasks(request, ansible_module):
+    """This fixture is used to seed foreman-tasks in bulk and remove them afterwards.
+    It is used by the scale tests of foreman-tasks-delete, foreman-tasks-resume
+    and check-old-foreman-tasks.
+    """
 
-    def teardown_backup_tests():
-        teardown = ansible_module.shell("rm -rf /tmp/backup-*; rm -rf /mnt/satellite-backup-*")
-        assert teardown.values()[0]["rc"] == 0
+    def seeded_tasks(batches):
+        return seed_tasks(ansible_module, batches)
+
+    def teardown_seeded_tasks():
+        remove_seeded_tasks(ansible_module)
+
+    request.addfinalizer(teardown_seeded_tasks)
+    return seeded_tasks
+
+
+@pytest.fixture(scope="function")
+def setup_backup_tests(request, host_state, ansible_module):
+    """ Setup/Teardown for backup/restore tests, skipped where the host is already clean."""
+
+    def remove_backups():
+        contacted = ansible_module.shell("rm -rf /tmp/backup-*; rm -rf /mnt/satellite-backup-*")
+        for result in contacted.values():
+            assert result["rc"] == 0
+
+    def start_services():
         ansible_module.command(Service.service_start())
+        wait_for_server(ansible_module)
+
+    host_state.step(ansible_module, "backups", remove_backups)
+    host_state.step(ansible_module, "services", start_services)
+
+    def teardown_backup_tests():
+        if next_test_uses(request.node, "setup_backup_tests"):
+            logger.info("next test sets up the backup tests, skipping the teardown")
+            return
+        host_state.step(ansible_module, "backups", remove_backups)
+        host_state.step(ansible_module, "services", start_services)
 
     request.addfinalizer(teardown_backup_tests)
 
 
 @pytest.fixture(scope="function")
-def setup_packages_lock_tests(request, ansible_module):
-    """ Setup/Teardown for Packages lock tests."""
-    # Test whether packages are locked or not
-    contacted = ansible_module.command("satellite-installer --lock-package-versions")
-    for result in contacted.values():
-        logger.info(result["stdout"])
-        assert result["rc"] == 0
-    contacted = ansible_module.command(Packages.status())
-    for result in contacted.values():
-        logger.info(result["stdout"])
-        assert "Packages are locked." in result["stdout"]
-        assert "Automatic locking of package versions is enabled in installer." in result["stdout"]
-        assert "FAIL" not in result["stdout"]
-        assert result["rc"] == 0
-    contacted = ansible_module.command(Packages.is_locked())
-    for result in contacted.values():
-        logger.info(result["stdout"])
-        assert "Packages are locked" in result["stdout"]
-        assert result["rc"] == 0
-    contacted = ansible_module.yum(name="zsh", state="absent")
-    for result in contacted.values():
-        assert result["rc"] == 0
-    contacted = ansible_module.yum(name="elinks", state="absent")
-    for result in contacted.values():
-        assert result["rc"] == 0
+def setup_packages_lock_tests(request, host_state, ansible_module):
+    """ Setup/Teardown for Packages lock tests, skipped where the host is already set up."""
 
-    def teardown_packages_lock_tests():
-        contacted = ansible_module.yum(name="zsh", state="absent")
+    def lock_packages():
+        # Test whether packages are locked or not
+        contacted = lock_package_versions(ansible_module)
         for result in contacted.values():
+            logger.info(result["stdout"])
+            assert "Packages are locked." in result["stdout"]
+            assert (
+                "Automatic locking of package versions is enabled in installer."
+                in result["stdout"]
+            )
+            assert "FAIL" not in result["stdout"]
             assert result["rc"] == 0
-        contacted = ansible_module.yum(name="elinks", state="absent")
+        contacted = ansible_module.command(Packages.is_locked())
         for result in contacted.values():
-            assert result["rc"] == 0
-        # lock packages
-        teardown = ansible_module.command("satellite-installer --lock-package-versions")
-        for result in teardown.values():
             logger.info(result["stdout"])
+            assert "Packages are locked" in result["stdout"]
             assert result["rc"] == 0
+        contacted = ansible_module.yum(name=["zsh", "elinks"], state="absent")
+        for result in contacted.values():
+            assert result["rc"] == 0
+        host_state.known["packages"] = "locked"
+
+    host_state.step(ansible_module, "packages", lock_packages)
+
+    def teardown_packages_lock_tests():
+        if next_test_uses(request.node, "setup_packages_lock_tests"):
+            logger.info("next test sets up the packages lock tests, skipping the teardown")
+            return
+        host_state.step(ansible_module, "packages", lock_packages)
 
     request.addfinalizer(teardown_packages_lock_tests)
+
+
+@pytest.fixture(scope="function")
+def ansible_module(ansible_module):
+    """pytest-ansible's ansible_module, timing every module call when run with --timings.
+    It is used by every test and fixture running commands on the server.
+    """
+    return timed_module(ansible_module)
+
+
+@pytest.fixture(scope="session")
+def host_state(request):
+    """Session-wide record of the host state declared by requires_state and leaves_state.
+    It is used by fixture declared_host_state.
+    """
+    state = HostState()
+    request.addfinalizer(state.restore)
+    return state
+
+
+@pytest.fixture(scope="function", autouse=True)
+def declared_host_state(request, host_state):
+    """This fixture brings the host into the state the test requires and records
+    the state it leaves behind, see testfm.state. It is used by every test.
+    """
+    wanted = required_state(request.node)
+    if transition_cost(host_state.known, wanted):
+        host_state.require(request.getfixturevalue("ansible_module"), wanted)
+
+    def record_left_state():
+        report = getattr(request.node, "rep_call", None)
+        host_state.leave(left_state(request.node), report is not None and report.passed)
+
+    request.addfinalizer(record_left_state)
+
+
+@pytest.fixture(scope="session")
+def foreman_api(request):
+    """Session-wide pooled session to the Foreman API.
+    It is used by fixtures setup_sync_plan and setup_sync_plans.
+    """
+    api = ForemanAPI()
+    request.addfinalizer(api.close)
+    return api
+
+
+@pytest.fixture(scope="session")
+def hammer(request):
+    """Session-wide hammer shell per host, saves the hammer start up on every command.
+    It is used by fixtures setup_for_hammer_defaults and setup_hammer_defaults.
+    """
+    shells = Hammer()
+    request.addfinalizer(shells.close)
+    return shells
+
+
+@pytest.fixture(scope="session")
+def provisioner():
+    """Session-wide installer of python tools from the controller's wheel cache.
+    It is used by fixture setup_install_pexpect.
+    """
+    return Provisioner()
+
+
+@pytest.fixture(scope="session")
+def local_repos(request):
+    """Session-wide server of the local stand-ins of the hotfix, upstream and EPEL repositories.
+    It is used by fixtures setup_hotfix_check, setup_upstream_repository and setup_epel_repository.
+    """
+    server = LocalRepoServer()
+    request.addfinalizer(server.stop)
+    return server
+
+
+@pytest.fixture(scope="session")
+def backup_pool(request):
+    """Session-wide pool of golden online/offline backups.
+    It is used by fixture setup_golden_backup.
+    """
+    pool = BackupPool()
+    request.addfinalizer(pool.destroy)
+    return pool
+
+
+@pytest.fixture(scope="session")
+def upgrade_checks():
+    """Session-wide results of upgrade check to every listed version, by host and version.
+    It is used by fixture setup_upgrade_check_matrix.
+    """
+    return {}
+
+
+@pytest.fixture(scope="function")
+def setup_upgrade_check_matrix(upgrade_checks, ansible_module):
+    """This fixture runs upgrade check to every version this system is upgradable to
+    once per session and hands the same results to every test asking for them.
+    It is used by tests test_positive_upgrade_check_timeline and
+    test_positive_upgrade_check_matrix of test_upgrade.py.
+    """
+    if not upgrade_checks:
+        upgrade_checks.update(
+            check_matrix(
+                ansible_module, options={"whitelist": "disk-performance,repositories-validate"}
+            )
+        )
+    return upgrade_checks
+
+
+@pytest.fixture(scope="function")
+def setup_golden_backup(request, backup_pool, ansible_module):
+    """This fixture hands out a disposable clone of the session's golden backup,
+    so restore tests do not have to take a backup of their own.
+    It is used by restore tests of test_restore.py.
+    """
+
+    def golden_backup(mode):
+        clone = backup_pool.clone(ansible_module, mode)
+
+        def teardown_golden_backup():
+            backup_pool.release(ansible_module, clone)
+
+        request.addfinalizer(teardown_golden_backup)
+        return clone
+
+    return golden_backup
+
+
+@pytest.fixture(scope="function")
+def setup_round_trip(request, ansible_module):
+    """This fixture builds a backup/restore round trip pipeline checkpointed in the
+    pytest cache, so a failed test rerun resumes at the failed stage.
+    The saved backup is removed once the whole pipeline passed.
+    It is used by test test_positive_backup_restore_round_trip of test_restore.py.
+    """
+    backup_dir = "/var/tmp/testfm-round-trip-{}".format(request.node.name)
+    key = "testfm/round_trip/{}".format(request.node.name)
+    pipelines = []
+
+    def round_trip(**kwargs):
+        pipeline = RoundTrip(
+            ansible_module, backup_dir, cache=request.config.cache, key=key, **kwargs
+        )
+        pipelines.append(pipeline)
+        return pipeline
+
+    def teardown_round_trip():
+        for pipeline in pipelines:
+            if len(pipeline.checkpoint["done"]) == len(STAGES):
+                ansible_module.file(path=backup_dir, state="absent")
+                pipeline.clear()
+
+    request.addfinalizer(teardown_round_trip)
+    return round_trip
@@ -1,12 +1,22 @@
-import yaml
+import pytest
 
 from testfm.advanced import Advanced
 from testfm.advanced_by_tag import AdvancedByTag
+from testfm.constants import foreman_maintain_data_yml
 from testfm.constants import sat_beta_repo
 from testfm.constants import sat_repos
 from testfm.decorators import capsule
+from testfm.decorators import scale
 from testfm.decorators import stubbed
+from testfm.firewall import firewall_snapshot
+from testfm.foreman_tasks import count_tasks
+from testfm.foreman_tasks import parse_resume_output
+from testfm.foreman_tasks import SCALE_COUNTS
+from testfm.foreman_tasks import TaskBatch
+from testfm.helpers import read_remote_yaml
 from testfm.log import logger
+from testfm.profiler import sync_plans_throughput
+from testfm.profiler import timed
 
 
 def test_positive_foreman_maintain_service_restart(ansible_module):
@@ -186,6 +196,74 @@ def test_positive_foreman_task_resume(ansible_module):
         assert "FAIL" not in result["stdout"]
 
 
+@scale
+@pytest.mark.parametrize("count", SCALE_COUNTS)
+def test_positive_foreman_tasks_delete_old_scale(setup_seeded_tasks, ansible_module, count):
+    """Delete old foreman-tasks at scale using advanced procedure run
+
+    :id: 3f8e2c71-6a0d-4b59-9c1e-d74a5b20f6e8
+
+    :setup:
+        1. foreman-maintain should be installed.
+        2. Seed count stopped tasks older than 30 days.
+
+    :steps:
+        1. Run foreman-maintain advanced procedure run
+        foreman-tasks-delete --state old
+
+    :expectedresults: every seeded task is deleted and the time it took is logged.
+
+    :CaseImportance: Medium
+    """
+    setup_seeded_tasks([TaskBatch(count, "stopped", "success", 31)])
+    contacted, elapsed = timed(
+        ansible_module, Advanced.run_foreman_tasks_delete({u"state": "old", u"assumeyes": True})
+    )
+    for result in contacted.values():
+        logger.info(result["stdout"])
+        assert "FAIL" not in result["stdout"]
+    logger.info("foreman-tasks-delete of {} old tasks took {:.1f}s".format(count, elapsed))
+    for counts in count_tasks(ansible_module).values():
+        assert not counts
+
+
+@scale
+@pytest.mark.parametrize("count", SCALE_COUNTS)
+def test_positive_foreman_tasks_resume_scale(setup_seeded_tasks, ansible_module, count):
+    """Resume paused foreman-tasks at scale using advanced procedure run
+
+    :id: b04d7e96-1c3a-4f28-8e5b-6a9f2d1c7e30
+
+    :setup:
+        1. foreman-maintain should be installed.
+        2. Seed count paused tasks with result error.
+
+    :steps:
+        1. Run foreman-maintain advanced procedure run
+        foreman-tasks-resume
+
+    :expectedresults: the procedure passes, finds every seeded task, every task
+        it did not resume is still paused and the time it took is logged.
+
+    :CaseImportance: Medium
+    """
+    setup_seeded_tasks([TaskBatch(count, "paused", "error")])
+    contacted, elapsed = timed(ansible_module, Advanced.run_foreman_tasks_resume())
+    left = count_tasks(ansible_module)
+    for host, result in contacted.items():
+        logger.info(result["stdout"])
+        assert "FAIL" not in result["stdout"]
+        resumed = parse_resume_output(result["stdout"])
+        assert resumed["found"] >= count
+        assert resumed["resumed"] + resumed["failed"] + resumed["skipped"] == resumed["found"]
+        assert left[host].get("paused", 0) >= count - resumed["resumed"]
+        logger.info(
+            "foreman-tasks-resume of {} paused tasks on {} took {:.1f}s: {}, left {}".format(
+                count, host, elapsed, resumed, left[host]
+            )
+        )
+
+
 def test_positive_foreman_tasks_ui_investigate(setup_install_pexpect, ansible_module):
     """Run foreman-tasks-ui-investigate using advanced procedure run
 
@@ -230,28 +308,24 @@ def test_positive_sync_plan_disable_enable(setup_sync_plan, ansible_module):
 
     :CaseImportance: Critical
     """
-    sync_ids, sat_hostname = setup_sync_plan()
+    sync_ids = setup_sync_plan()
     contacted = ansible_module.command(Advanced.run_sync_plans_disable())
     for result in contacted.values():
         logger.info(result["stdout"])
         assert result["rc"] == 0
         assert "FAIL" not in result["stdout"]
-    ansible_module.fetch(src="/var/lib/foreman-maintain/data.yml", dest="./")
-    with open("./{}/var/lib/foreman-maintain/data.yml".format(sat_hostname)) as f:
-        data_yml = yaml.safe_load(f)
-    assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":disabled"])
-    assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":disabled"])
+    for data_yml in read_remote_yaml(ansible_module, foreman_maintain_data_yml).values():
+        assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":disabled"])
+        assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":disabled"])
 
     contacted = ansible_module.command(Advanced.run_sync_plans_enable())
     for result in contacted.values():
         logger.info(result["stdout"])
         assert result["rc"] == 0
         assert "FAIL" not in result["stdout"]
-    ansible_module.fetch(src="/var/lib/foreman-maintain/data.yml", dest="./")
-    with open("./{}/var/lib/foreman-maintain/data.yml".format(sat_hostname)) as f:
-        data_yml = yaml.safe_load(f)
-    assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":enabled"])
-    assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":enabled"])
+    for data_yml in read_remote_yaml(ansible_module, foreman_maintain_data_yml).values():
+        assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":enabled"])
+        assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":enabled"])
 
 
 @capsule
@@ -280,18 +354,16 @@ def test_positive_procedure_by_tag_check_migrations(ansible_module):
     for result in contacted.values():
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
-    check_iptables = ansible_module.command("iptables -L")
-    for rules in check_iptables.values():
-        logger.info(rules["stdout"])
-        assert "FOREMAN_MAINTAIN" in rules["stdout"]
+    for snapshot in firewall_snapshot(ansible_module).values():
+        logger.info(snapshot.rules)
+        assert "FOREMAN_MAINTAIN" in snapshot.chains
     teardown = ansible_module.command(AdvancedByTag.post_migrations())
     for result in teardown.values():
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
-    check_iptables = ansible_module.command("iptables -L")
-    for rules in check_iptables.values():
-        logger.info(rules["stdout"])
-        assert "FOREMAN_MAINTAIN" not in rules["stdout"]
+    for snapshot in firewall_snapshot(ansible_module).values():
+        logger.info(snapshot.rules)
+        assert "FOREMAN_MAINTAIN" not in snapshot.chains
 
 
 @capsule
@@ -318,6 +390,44 @@ def test_positive_procedure_by_tag_restore_confirmation(ansible_module):
         assert result["rc"] == 0
 
 
+@scale
+def test_positive_sync_plans_disable_enable_throughput(
+    setup_sync_plans, foreman_api, ansible_module
+):
+    """Benchmark sync-plans-disable and sync-plans-enable against thousands of sync plans
+
+    :id: d6f1a3b8-95c2-4e07-bb4d-8a1e6c3f2907
+
+    :setup:
+        1. foreman-maintain should be installed.
+        2. set :manage_crond: true in /etc/foreman-maintain/foreman_maintain.yml
+
+    :steps:
+        1. Create K sync plans spread over M new organizations, for growing K and M.
+        2. Run foreman-maintain advanced procedure run sync-plans-disable
+           and sync-plans-enable for each size.
+        3. Check that data.yml tracks every sync plan.
+
+    :expectedresults: every sync plan is tracked and the time per sync plan
+        does not grow with the number of sync plans.
+
+    :CaseImportance: Medium
+    """
+    per_plan = {}
+    created = 0
+    for plans, organizations in ((100, 1), (1000, 10), (5000, 100)):
+        created = setup_sync_plans(plans - created, organizations)
+        sync_ids = foreman_api.enabled_sync_plan_ids()
+        for host, report in sync_plans_throughput(ansible_module, sync_ids).items():
+            for procedure, timing in report.items():
+                assert not timing["missing"], procedure
+                per_plan.setdefault((host, procedure), []).append(1 / timing["plans_per_second"])
+    for (host, procedure), seconds in per_plan.items():
+        logger.info("sync-plans-{} seconds per plan on {}: {}".format(procedure, host, seconds))
+        # start up costs make small runs slower per plan, quadratic runs get slower with size
+        assert seconds[-1] <= 2 * seconds[0], procedure
+
+
 def test_positive_sync_plan_with_hammer_defaults(setup_for_hammer_defaults, ansible_module):
     """Verify that sync plan is disabled and enabled
     with hammer defaults set.
@@ -1,6 +1,7 @@
 from fauxfactory import gen_string
 
 from testfm.backup import Backup
+from testfm.backup_catalog import BackupCatalog
 from testfm.decorators import capsule
 from testfm.decorators import ends_in
 from testfm.helpers import server
@@ -73,10 +74,7 @@ def test_positive_backup_online(setup_backup_tests, ansible_module):
         assert result["rc"] == 0
 
     # getting created files
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = ONLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -111,17 +109,14 @@ def test_positive_backup_online_skip_pulp_content(setup_backup_tests, ansible_mo
         assert result["rc"] == 0
 
     # getting created files
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = ONLINE_BACKUP_FILES
 
     # capsule-specific file list
     if server() == "capsule":
         expected_files = ONLINE_CAPS_FILES
     assert set(files_list).issuperset(expected_files), assert_msg
-    assert CONTENT_FILES not in files_list, "content not skipped"
+    assert set(CONTENT_FILES).isdisjoint(files_list), "content not skipped"
 
 
 @capsule
@@ -152,8 +147,7 @@ def test_positive_backup_online_preserve_directory(setup_backup_tests, ansible_m
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.command("ls -a {}".format(subdir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = ONLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -187,10 +181,7 @@ def test_positive_backup_online_split_pulp_tar(setup_backup_tests, ansible_modul
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = ONLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -224,23 +215,17 @@ def test_positive_backup_online_incremental(setup_backup_tests, ansible_module):
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
-    contacted = ansible_module.command("ls {}".format(subdir))
-    source_dir = contacted.values()[0]["stdout_lines"][0]
+    source_dir = BackupCatalog(ansible_module, subdir).latest().path
     contacted = ansible_module.command(
-        Backup.run_online_backup(
-            ["-y", "--incremental", "{}/{}".format(subdir, source_dir), dest_dir]
-        )
+        Backup.run_online_backup(["-y", "--incremental", source_dir, dest_dir])
     )
     for result in contacted.values():
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.stat(path=subdir)
-    source_size = contacted.values()[0]["stat"]["size"]
-    contacted = ansible_module.stat(path=dest_dir)
-    dest_size = contacted.values()[0]["stat"]["size"]
-    assert source_size >= dest_size
+    catalog = BackupCatalog(ansible_module, [subdir, dest_dir])
+    assert catalog.get(source_dir).size >= catalog.latest().size
 
 
 @capsule
@@ -269,10 +254,7 @@ def test_positive_backup_online_caspule_features(setup_backup_tests, ansible_mod
         assert result["rc"] == 0
 
     # getting created files
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = ONLINE_BACKUP_FILES
     # capsule-specific file list
     if server() == "capsule":
@@ -340,10 +322,7 @@ def test_positive_backup_offline(setup_backup_tests, ansible_module):
         assert result["rc"] == 0
 
     # getting created files
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = OFFLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -378,17 +357,14 @@ def test_positive_backup_offline_skip_pulp_content(setup_backup_tests, ansible_m
         assert result["rc"] == 0
 
     # getting created files
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = OFFLINE_BACKUP_FILES
 
     # capsule-specific file list
     if server() == "capsule":
         expected_files = OFFLINE_CAPS_FILES
     assert set(files_list).issuperset(expected_files), assert_msg
-    assert CONTENT_FILES not in files_list, "content not skipped"
+    assert set(CONTENT_FILES).isdisjoint(files_list), "content not skipped"
 
 
 @capsule
@@ -420,8 +396,7 @@ def test_positive_backup_offline_preserve_directory(setup_backup_tests, ansible_
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.command("ls -a {}".format(subdir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = OFFLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -456,10 +431,7 @@ def test_positive_backup_offline_split_pulp_tar(setup_backup_tests, ansible_modu
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = OFFLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -493,23 +465,17 @@ def test_positive_backup_offline_incremental(setup_backup_tests, ansible_module)
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
-    contacted = ansible_module.command("ls {}".format(subdir))
-    source_dir = contacted.values()[0]["stdout_lines"][0]
+    source_dir = BackupCatalog(ansible_module, subdir).latest().path
     contacted = ansible_module.command(
-        Backup.run_offline_backup(
-            ["-y", "--incremental", "{}/{}".format(subdir, source_dir), dest_dir]
-        )
+        Backup.run_offline_backup(["-y", "--incremental", source_dir, dest_dir])
     )
     for result in contacted.values():
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.stat(path=subdir)
-    source_size = contacted.values()[0]["stat"]["size"]
-    contacted = ansible_module.stat(path=dest_dir)
-    dest_size = contacted.values()[0]["stat"]["size"]
-    assert source_size >= dest_size
+    catalog = BackupCatalog(ansible_module, [subdir, dest_dir])
+    assert catalog.get(source_dir).size >= catalog.latest().size
 
 
 @capsule
@@ -538,10 +504,7 @@ def test_positive_backup_offline_capsule_features(setup_backup_tests, ansible_mo
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = OFFLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -575,10 +538,7 @@ def test_positive_backup_offline_logical(setup_backup_tests, ansible_module):
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
 
-    contacted = ansible_module.command("ls {}".format(subdir))
-    timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-    contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-    files_list = contacted.values()[0]["stdout_lines"]
+    files_list = BackupCatalog(ansible_module, subdir).latest().files
     expected_files = OFFLINE_BACKUP_FILES + ONLINE_BACKUP_FILES
 
     # capsule-specific file list
@@ -738,10 +698,7 @@ def test_positive_backup_stopped_dynflowd(setup_backup_tests, ansible_module):
             assert result["rc"] == 0
 
         # getting created files
-        contacted = ansible_module.command("ls {}".format(subdir))
-        timestamped_dir = contacted.values()[0]["stdout_lines"][0]
-        contacted = ansible_module.command("ls -a {}/{}".format(subdir, timestamped_dir))
-        files_list = contacted.values()[0]["stdout_lines"]
+        files_list = BackupCatalog(ansible_module, subdir).latest().files
         expected_files = ONLINE_BACKUP_FILES
 
         # capsule-specific file list
@@ -0,0 +1,62 @@
+from testfm.foreman_api import ForemanAPI
+from testfm.foreman_api_stub import StubForemanAPI
+
+
+def test_positive_foreman_api_bulk_sync_plans():
+    """Create organizations and sync plans in bulk and read them back page by page
+
+    :id: 87dcaeac-9a51-40f4-8010-e03e0ef6fc6b
+
+    :setup:
+        1. Serve the organization and sync plan endpoints from memory.
+
+    :steps:
+        1. Create organizations and enabled and disabled sync plans in bulk.
+        2. List them with pages smaller than the number of records.
+
+    :expectedresults: every created record is listed once and only the
+        enabled sync plan ids are returned as enabled.
+
+    :CaseImportance: Medium
+    """
+    with StubForemanAPI() as url:
+        api = ForemanAPI(url, per_page=2)
+        org_ids = api.create_organizations(["org{}".format(index) for index in range(3)])
+        enabled = api.create_sync_plans(org_ids[0], ["plan{}".format(index) for index in range(5)])
+        disabled = api.create_sync_plans(org_ids[1], ["disabled"], enabled=False)
+        listed = [organization["id"] for organization in api.organizations()]
+        assert sorted(listed) == sorted(org_ids)
+        assert sorted(plan["id"] for plan in api.sync_plans(org_ids[0])) == sorted(enabled)
+        assert [plan["id"] for plan in api.sync_plans(org_ids[1])] == disabled
+        assert api.enabled_sync_plan_ids() == sorted(enabled)
+        api.close()
+
+
+def test_positive_foreman_api_delete_organization_sync_plans():
+    """Delete organizations together with their sync plans
+
+    :id: 644c613e-bc92-4cc3-be1e-70c21756f43d
+
+    :setup:
+        1. Serve the organization and sync plan endpoints from memory.
+
+    :steps:
+        1. Create two organizations with a sync plan each.
+        2. Delete the first organization.
+
+    :expectedresults: the sync plans of the deleted organization are gone and
+        those of the other organization are left.
+
+    :CaseImportance: Medium
+    """
+    stub = StubForemanAPI()
+    with stub as url:
+        api = ForemanAPI(url)
+        org_ids = api.create_organizations(["org1", "org2"])
+        api.create_sync_plans(org_ids[0], ["plan1"])
+        kept = api.create_sync_plans(org_ids[1], ["plan2"])
+        api.delete_organizations(org_ids[:1])
+        assert [organization["id"] for organization in api.organizations()] == org_ids[1:]
+        assert sorted(stub.sync_plans) == kept
+        assert api.enabled_sync_plan_ids() == kept
+        api.close()
@@ -1,7 +1,14 @@
+import pytest
+
 from testfm.decorators import capsule
+from testfm.decorators import scale
 from testfm.decorators import stubbed
+from testfm.foreman_tasks import count_tasks
+from testfm.foreman_tasks import SCALE_COUNTS
+from testfm.foreman_tasks import TaskBatch
 from testfm.health import Health
 from testfm.log import logger
+from testfm.profiler import timed
 
 
 @capsule
@@ -526,6 +533,43 @@ def test_positive_check_old_foreman_tasks(setup_old_foreman_tasks, ansible_modul
         assert result["rc"] == 0
 
 
+@scale
+@pytest.mark.parametrize("count", SCALE_COUNTS)
+def test_positive_check_old_foreman_tasks_scale(setup_seeded_tasks, ansible_module, count):
+    """Verify check-old-foreman-tasks at scale.
+
+    :id: 7a2c5e19-4d83-4b6f-a0e7-15c9f8d3b246
+
+    :setup:
+        1. foreman-maintain should be installed.
+        2. Seed count stopped and paused tasks older than 30 days.
+
+    :steps:
+        1. Run foreman-maintain health check --label check-old-foreman-tasks --assumeyes
+        2. Assert that old tasks are found and deleted.
+
+    :expectedresults: every seeded task is deleted and the time it took is logged.
+
+    :CaseImportance: Medium
+    """
+    setup_seeded_tasks(
+        [
+            TaskBatch(count // 2, "stopped", "success", 31),
+            TaskBatch(count - count // 2, "paused", "error", 31),
+        ]
+    )
+    contacted, elapsed = timed(
+        ansible_module, Health.check(["--label", "check-old-foreman-tasks", "--assumeyes"])
+    )
+    for result in contacted.values():
+        logger.info(result["stdout"])
+        assert "paused or stopped task(s) older than 30 days" in result["stdout"]
+        assert "Deleted old stopped and paused tasks:" in result["stdout"]
+    logger.info("check-old-foreman-tasks of {} old tasks took {:.1f}s".format(count, elapsed))
+    for counts in count_tasks(ansible_module).values():
+        assert not counts
+
+
 @capsule
 def test_positive_check_tmout_variable(ansible_module):
     """Verify check-tmout-variable. Upstream issue #23430.
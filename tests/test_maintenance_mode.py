@@ -1,7 +1,10 @@
-import yaml
-
+from testfm.constants import foreman_maintain_data_yml
+from testfm.decorators import scale
+from testfm.firewall import firewall_snapshot
+from testfm.helpers import read_remote_yaml
 from testfm.log import logger
 from testfm.maintenance_mode import MaintenanceMode
+from testfm.profiler import profile_maintenance_mode
 
 
 def test_positive_maintenance_mode(setup_sync_plan, ansible_module):
@@ -35,7 +38,7 @@ def test_positive_maintenance_mode(setup_sync_plan, ansible_module):
 
     :CaseImportance: Critical
     """
-    sync_ids, sat_hostname = setup_sync_plan()
+    sync_ids = setup_sync_plan()
     maintenance_mode_off = [
         "Status of maintenance-mode: Off",
         "Iptables chain: absent",
@@ -72,15 +75,12 @@ def test_positive_maintenance_mode(setup_sync_plan, ansible_module):
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
         assert "Total {} sync plans are now disabled.".format(len(sync_ids)) in result["stdout"]
-    ansible_module.fetch(src="/var/lib/foreman-maintain/data.yml", dest="./")
-    with open("./{}/var/lib/foreman-maintain/data.yml".format(sat_hostname)) as f:
-        data_yml = yaml.safe_load(f)
-    assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":disabled"])
-    assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":disabled"])
-    check_iptables = ansible_module.command("iptables -L")
-    for rules in check_iptables.values():
-        logger.info(rules["stdout"])
-        assert "FOREMAN_MAINTAIN" in rules["stdout"]  # Assert FOREMAN_MAINTAIN is listed iptables
+    for data_yml in read_remote_yaml(ansible_module, foreman_maintain_data_yml).values():
+        assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":disabled"])
+        assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":disabled"])
+    for snapshot in firewall_snapshot(ansible_module).values():
+        logger.info(snapshot.rules)
+        assert "FOREMAN_MAINTAIN" in snapshot.chains  # Assert FOREMAN_MAINTAIN chain is present
     # Assert crond.service is stopped
     contacted = ansible_module.service_facts()
     state = contacted.values()[0]["ansible_facts"]["services"]["crond.service"]["state"]
@@ -110,16 +110,13 @@ def test_positive_maintenance_mode(setup_sync_plan, ansible_module):
         assert result["rc"] == 0
         assert "FAIL" not in result["stdout"]
         assert "Total {} sync plans are now enabled.".format(len(sync_ids)) in result["stdout"]
-    ansible_module.fetch(src="/var/lib/foreman-maintain/data.yml", dest="./")
-    with open("./{}/var/lib/foreman-maintain/data.yml".format(sat_hostname)) as f:
-        data_yml = yaml.safe_load(f)
-    assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":enabled"])
-    assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":enabled"])
-    check_iptables = ansible_module.command("iptables -L")
-    for rules in check_iptables.values():
-        logger.info(rules["stdout"])
-        # Assert FOREMAN_MAINTAIN not listed in iptables
-        assert "FOREMAN_MAINTAIN" not in rules["stdout"]
+    for data_yml in read_remote_yaml(ansible_module, foreman_maintain_data_yml).values():
+        assert len(sync_ids) == len(data_yml[":default"][":sync_plans"][":enabled"])
+        assert sorted(sync_ids) == sorted(data_yml[":default"][":sync_plans"][":enabled"])
+    for snapshot in firewall_snapshot(ansible_module).values():
+        logger.info(snapshot.rules)
+        # Assert FOREMAN_MAINTAIN chain is absent
+        assert "FOREMAN_MAINTAIN" not in snapshot.chains
     # Assert crond.service is running
     contacted = ansible_module.service_facts()
     state = contacted.values()[0]["ansible_facts"]["services"]["crond.service"]["state"]
@@ -141,3 +138,51 @@ def test_positive_maintenance_mode(setup_sync_plan, ansible_module):
         assert "OK" in result["stdout"]
         assert result["rc"] == 1
         assert "Maintenance mode is Off" in result["stdout"]
+
+
+@scale
+def test_positive_maintenance_mode_transition_timing(setup_sync_plans, ansible_module):
+    """Profile maintenance-mode start and stop with a growing number of sync plans
+
+    :id: 0b6f9d2e-7c41-4d8a-9a37-5e2c8f1b6d40
+
+    :setup:
+        1. foreman-maintain should be installed.
+        2. set :manage_crond: true in /etc/foreman-maintain/foreman_maintain.yml
+
+    :steps:
+        1. Create 1, 100 and 1000 active sync plans in turn.
+        2. Run foreman-maintain maintenance-mode start and stop for each count.
+        3. Sample the FOREMAN_MAINTAIN chain, crond and the sync plans
+           disabled in data.yml meanwhile.
+
+    :expectedresults: the time until each side effect of start and stop is
+        recorded per number of sync plans and every side effect takes place.
+
+    :CaseImportance: Medium
+    """
+    timings = {}
+    created = 0
+    for count in (1, 100, 1000):
+        created = setup_sync_plans(count - created)
+        timings[count] = profile_maintenance_mode(ansible_module)
+        for host, report in timings[count]["start"].items():
+            assert report["rc"] == 0
+            assert report["chain"] is not None
+            assert report["crond"] is not None
+            assert report["sync_plans"], host
+            assert report["sync_plans"][-1][1] >= count
+        for host, report in timings[count]["stop"].items():
+            assert report["rc"] == 0
+            assert report["chain"] is not None
+            assert report["crond"] is not None
+            assert report["sync_plans"], host
+            assert report["sync_plans"][-1][1] == 0
+    for count, transitions in sorted(timings.items()):
+        for transition, report in transitions.items():
+            for host, timing in report.items():
+                logger.info(
+                    "{} sync plans: maintenance-mode {} took {:.1f}s on {}".format(
+                        count, transition, timing["done"], host
+                    )
+                )
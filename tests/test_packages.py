@@ -2,6 +2,7 @@ from testfm.decorators import capsule
 from testfm.decorators import starts_in
 from testfm.log import logger
 from testfm.packages import Packages
+from testfm.packages import RpmSnapshot
 
 
 @capsule
@@ -167,6 +168,7 @@ def test_positive_fm_packages_install(ansible_module, setup_packages_lock_tests)
         assert result["rc"] == 1
         assert "Use foreman-maintain packages install/update <package>" in result["stdout"]
     # Test whether FM packages install/ update command works as expected.
+    snapshots = RpmSnapshot.take(ansible_module)
     contacted = ansible_module.raw(
         Packages.install(["--assumeyes", "zsh-5.0.2-31.el7.x86_64 elinks"])
     )
@@ -176,6 +178,13 @@ def test_positive_fm_packages_install(ansible_module, setup_packages_lock_tests)
         assert "Nothing to do" not in result["stdout"]
         assert "Packages are locked." in result["stdout"]
         assert "Automatic locking of package versions is enabled in installer." in result["stdout"]
+    installed = RpmSnapshot.take(ansible_module)
+    for host, snapshot in installed.items():
+        diff = snapshots[host].diff(snapshot)
+        logger.info("packages install on {} of {} rpms: {}".format(host, len(snapshot), diff))
+        assert diff["added"]["zsh"] == ["0:5.0.2-31.el7.x86_64"]
+        assert "elinks" in diff["added"]
+        assert not diff["removed"]
     contacted = ansible_module.raw(Packages.update(["--assumeyes", "zsh"]))
     for result in contacted.values():
         logger.info(result["stdout"])
@@ -183,6 +192,12 @@ def test_positive_fm_packages_install(ansible_module, setup_packages_lock_tests)
         assert "Nothing to do" not in result["stdout"]
         assert "Packages are locked." in result["stdout"]
         assert "Automatic locking of package versions is enabled in installer." in result["stdout"]
+    for host, snapshot in RpmSnapshot.take(ansible_module).items():
+        diff = installed[host].diff(snapshot)
+        logger.info("packages update on {} of {} rpms: {}".format(host, len(snapshot), diff))
+        assert "zsh" in diff["changed"]
+        assert not diff["added"]
+        assert not diff["removed"]
     # Test whether packages are unlocked or not
     contacted = ansible_module.command("satellite-installer --no-lock-package-versions")
     for result in contacted.values():
@@ -1,6 +1,5 @@
 from fauxfactory import gen_string
 
-from testfm.backup import Backup
 from testfm.decorators import capsule
 from testfm.log import logger
 from testfm.restore import Restore
@@ -10,7 +9,7 @@ BADDIR_MSG = "The given directory does not contain the " "required files or has
 
 
 @capsule
-def test_positive_restore_online_backup(ansible_module):
+def test_positive_restore_online_backup(setup_golden_backup, ansible_module):
     """Restore online backup of server
 
     :id: 3b83f757-2bf8-49ff-b237-bd466c5694bb
@@ -18,7 +17,7 @@ def test_positive_restore_online_backup(ansible_module):
     :setup:
 
         1. foreman-maintain should be installed.
-        2. Take online backup of server.
+        2. Clone golden online backup of server.
     :steps:
         1. Run foreman-maintain restore /backup_dir/
 
@@ -26,25 +25,10 @@ def test_positive_restore_online_backup(ansible_module):
 
     :CaseImportance: Critical
     """
-    # preparing a target dir
-    backup_dir = "online_backup_restore"
-    setup = ansible_module.command("rm -rf /tmp/{}".format(backup_dir))
-    assert setup.values()[0]["rc"] == 0
-    setup = ansible_module.file(
-        path="/tmp/{}".format(backup_dir), state="directory", owner="postgres",
-    )
-    # saving backup to specified dir
-    setup = ansible_module.command(
-        Backup.run_online_backup(["-y", "--preserve-directory", "/tmp/{}".format(backup_dir)])
-    )
-    for result in setup.values():
-        logger.info(result["stdout"])
-        assert "FAIL" not in result["stdout"]
-        assert result["rc"] == 0
+    # clone of the session's golden online backup
+    backup_dir = setup_golden_backup("online")
     # restore from previously saved backup
-    contacted = ansible_module.command(
-        Restore._construct_command(["-y", "/tmp/{}".format(backup_dir)])
-    )
+    contacted = ansible_module.command(Restore._construct_command(["-y", backup_dir]))
     for result in contacted.values():
         logger.info(result)
         assert "FAIL" not in result["stdout"]
@@ -52,7 +36,7 @@ def test_positive_restore_online_backup(ansible_module):
 
 
 @capsule
-def test_positive_restore_offline_backup(ansible_module):
+def test_positive_restore_offline_backup(setup_golden_backup, ansible_module):
     """Restore offline backup of server
 
     :id: 1005c983-13d4-451b-8115-8fce504104ee
@@ -60,7 +44,7 @@ def test_positive_restore_offline_backup(ansible_module):
     :setup:
 
         1. foreman-maintain should be installed.
-        2. Take offline backup of server.
+        2. Clone golden offline backup of server.
     :steps:
         1. Run foreman-maintain restore /backup_dir/
 
@@ -68,25 +52,10 @@ def test_positive_restore_offline_backup(ansible_module):
 
     :CaseImportance: Critical
     """
-    # preparing a target dir
-    backup_dir = "offline_backup_restore"
-    setup = ansible_module.command("rm -rf /tmp/{}".format(backup_dir))
-    assert setup.values()[0]["rc"] == 0
-    setup = ansible_module.file(
-        path="/tmp/{}".format(backup_dir), state="directory", owner="postgres",
-    )
-    # saving backup to specified dir
-    setup = ansible_module.command(
-        Backup.run_offline_backup(["-y", "--preserve-directory", "/tmp/{}".format(backup_dir)])
-    )
-    for result in setup.values():
-        logger.info(result["stdout"])
-        assert "FAIL" not in result["stdout"]
-        assert result["rc"] == 0
+    # clone of the session's golden offline backup
+    backup_dir = setup_golden_backup("offline")
     # restore from previously saved backup
-    contacted = ansible_module.command(
-        Restore._construct_command(["-y", "/tmp/{}".format(backup_dir)])
-    )
+    contacted = ansible_module.command(Restore._construct_command(["-y", backup_dir]))
     for result in contacted.values():
         logger.info(result)
         assert "FAIL" not in result["stdout"]
@@ -141,3 +110,41 @@ def test_negative_restore_baddir(ansible_module):
         logger.info(result["stderr"])
         assert result["rc"] == 1
         assert BADDIR_MSG in result["stdout"]
+
+
+def test_positive_backup_restore_round_trip(setup_round_trip, ansible_module):
+    """Take online backup, change data, restore it and verify the change is reverted
+
+    :id: 53dbd7de-58f4-497a-9eff-f1f534c30cc9
+
+    :setup:
+        1. foreman-maintain should be installed.
+
+    :steps:
+        1. Run foreman-maintain backup online --preserve-directory /backup_dir/
+        2. Create an organization.
+        3. Run foreman-maintain restore /backup_dir/
+        4. Run foreman-maintain health check --label server-ping
+        5. Verify the organization is gone.
+
+    :expectedresults: Restore reverts the data changed after the backup,
+        each stage is timed and a failed stage is resumed on rerun.
+
+    :CaseImportance: High
+    """
+    # fixed name, a rerun resuming after the mutate stage verifies the same organization
+    org_name = "testfm_round_trip"
+
+    def create_org(ansible_module, backup_dir):
+        contacted = ansible_module.command("hammer organization create --name {}".format(org_name))
+        for result in contacted.values():
+            assert result["rc"] == 0
+
+    def org_reverted(ansible_module, backup_dir):
+        contacted = ansible_module.command("hammer organization info --name {}".format(org_name))
+        for result in contacted.values():
+            assert result["rc"] != 0
+
+    pipeline = setup_round_trip(mutate=create_org, verify=org_reverted)
+    timings = pipeline.run()
+    logger.info("round trip stage timings: {}".format(timings))
@@ -1,6 +1,10 @@
 from testfm.decorators import capsule
+from testfm.decorators import leaves_state
+from testfm.decorators import requires_state
 from testfm.health import Health
 from testfm.log import logger
+from testfm.profiler import profile_service_restart
+from testfm.service import parse_service_status
 from testfm.service import Service
 
 
@@ -130,6 +134,8 @@ def test_positive_service_disable(ansible_module):
 
 
 @capsule
+@requires_state(services="stopped")
+@leaves_state(services="running")
 def test_positive_automate_bz1626651(ansible_module):
     """Disable services using foreman-maintain service
 
@@ -137,30 +143,20 @@ def test_positive_automate_bz1626651(ansible_module):
 
     :setup:
         1. foreman-maintain should be installed.
+        2. Services are stopped with foreman-maintain service stop.
 
     :steps:
-        1. Run foreman-maintain service stop.
-        2. Run foreman-maintain service restart
+        1. Run foreman-maintain service restart
 
     :expectedresults: service should restart.
 
     :CaseImportance: Critical
     """
-    try:
-        contacted = ansible_module.command(Service.service_stop())
-        for result in contacted.values():
-            logger.info(result["stdout"])
-            assert "FAIL" not in result["stdout"]
-            assert result["rc"] == 0
-        contacted = ansible_module.command(Service.service_restart())
-        for result in contacted.values():
-            logger.info(result["stdout"])
-            assert "FAIL" not in result["stdout"]
-            assert result["rc"] == 0
-    finally:
-        teardown = ansible_module.command(Service.service_start())
-        for result in teardown.values():
-            assert result["rc"] == 0
+    contacted = ansible_module.command(Service.service_restart())
+    for result in contacted.values():
+        logger.info(result["stdout"])
+        assert "FAIL" not in result["stdout"]
+        assert result["rc"] == 0
 
 
 @capsule
@@ -183,9 +179,13 @@ def test_positive_service_status_clocale(ansible_module):
     for result in contacted.values():
         logger.info(result)
         assert result["rc"] == 0
+        units = parse_service_status(result["stdout"])
+        assert units
+        assert all(unit.state == "active" for unit in units.values())
 
 
 @capsule
+@requires_state(services="stopped")
 def test_positive_failed_service_status(ansible_module):
     """Verify foreman-maintain service status return error when service stopped
 
@@ -193,28 +193,21 @@ def test_positive_failed_service_status(ansible_module):
 
     :setup:
         1. foreman-maintain should be installed.
+        2. Services are stopped with foreman-maintain service stop.
 
     :steps:
-        1. Run foreman-maintain service stop.
-        2. Run foreman-maintain service status.
+        1. Run foreman-maintain service status.
 
     :expectedresults: service status should return error code.
 
     :CaseImportance: Critical
     """
-    try:
-        setup = ansible_module.command(Service.service_stop())
-        for result in setup.values():
-            logger.info(result["stdout"])
-            assert result["rc"] == 0
-        contacted = ansible_module.command(Service.service_status())
-        for result in contacted.values():
-            logger.info(result)
-            assert result["rc"] != 0
-    finally:
-        teardown = ansible_module.command(Service.service_start())
-        for result in teardown.values():
-            assert result["rc"] == 0
+    contacted = ansible_module.command(Service.service_status())
+    for result in contacted.values():
+        logger.info(result)
+        assert result["rc"] != 0
+        units = parse_service_status(result["stdout"])
+        assert any(unit.state != "active" for unit in units.values())
 
 
 def test_positive_fm_service_restart_bz_1696862(setup_bz_1696862, ansible_module):
@@ -241,3 +234,29 @@ def test_positive_fm_service_restart_bz_1696862(setup_bz_1696862, ansible_module
         logger.info(result["stdout"])
         assert "FAIL" not in result["stdout"]
         assert result["rc"] == 0
+
+
+def test_positive_service_restart_latency(ansible_module):
+    """Profile restart latency of every service foreman-maintain manages
+
+    :id: 4ea1e0b5-5adf-42f8-a49d-f86b7790fc2c
+
+    :setup:
+        1. foreman-maintain should be installed.
+
+    :steps:
+        1. Run foreman-maintain service list
+        2. Run foreman-maintain service restart --only <service> for each service
+        3. Run foreman-maintain service restart
+        4. Sample systemctl show and poll health check --label server-ping meanwhile
+
+    :expectedresults: time-to-stop, time-to-active and time-to-healthy are
+        recorded per service and every service comes back after a restart of all.
+
+    :CaseImportance: Medium
+    """
+    scenarios = profile_service_restart(ansible_module)
+    for latencies in scenarios["all"].values():
+        for unit, latency in latencies.items():
+            assert latency["stop"] is None or latency["active"] is not None, unit
+            assert latency["healthy"] is not None
@@ -2,6 +2,9 @@ from testfm.decorators import capsule
 from testfm.helpers import product
 from testfm.helpers import server
 from testfm.log import logger
+from testfm.profiler import compare_upgrade_timelines
+from testfm.profiler import upgrade_timeline
+from testfm.profiler import write_upgrade_timeline
 from testfm.upgrade import Upgrade
 
 
@@ -97,3 +100,69 @@ def test_positive_repositories_validate(setup_install_pkgs, ansible_module):
         assert "SKIPPED" in result["stdout"]
         assert "FAIL" not in result["stdout"]
         assert skip_message in result["stdout"]
+
+
+@capsule
+def test_positive_upgrade_check_timeline(request, setup_upgrade_check_matrix):
+    """Profile the phases and steps of upgrade check for every listed version
+
+    :id: 5c0f7a8e-2b91-4e6d-8f14-93a7d2b6c1e5
+
+    :setup:
+        1. foreman-maintain should be installed.
+
+    :steps:
+        1. Run foreman-maintain upgrade list-versions
+        2. Run foreman-maintain upgrade check for each version with its output
+           lines timestamped.
+        3. Split the output in phases and steps and write the timeline as JSON.
+        4. Compare the phase durations across versions.
+
+    :expectedresults: a timeline with the duration of every phase and step is
+        written for each version.
+
+    :CaseImportance: Medium
+    """
+    directory = request.config.cache.makedir("upgrade_timelines")
+    timelines = {}
+    for host, checks in setup_upgrade_check_matrix.items():
+        for version, check in checks.items():
+            assert check.phases, version
+            for phase in check.phases:
+                assert phase.duration is not None
+            timelines[version] = upgrade_timeline(check.phases)
+            write_upgrade_timeline(
+                str(directory.join("{}-{}.json".format(host, version))), check.phases
+            )
+    compare_upgrade_timelines(timelines)
+
+
+@capsule
+def test_positive_upgrade_check_matrix(ansible_module, setup_upgrade_check_matrix):
+    """Run upgrade check to every version this system is upgradable to
+
+    :id: 9e3b6a14-0d5f-4c27-b8a9-2f61c7e4d853
+
+    :setup:
+        1. foreman-maintain should be installed.
+
+    :steps:
+        1. Run foreman-maintain upgrade list-versions
+        2. Run foreman-maintain upgrade check for all versions one after another.
+
+    :expectedresults: a result with return code, duration and parsed phases
+        is collected for every listed version, a check passes unless a step
+        failed or warned.
+
+    :CaseImportance: Medium
+    """
+    versions = ansible_module.command(Upgrade.list_versions()).values()[0]["stdout_lines"]
+    for checks in setup_upgrade_check_matrix.values():
+        assert sorted(checks) == sorted(versions)
+        for version, check in checks.items():
+            logger.info("\n".join(check.output))
+            assert check.phases, version
+            if check.rc == 0:
+                assert not check.failed, version
+            else:
+                assert check.failed or check.warnings, version